@@ -1,17 +1,44 @@
+import logging
+from collections import deque
 from mesa import Agent
-from stable_baselines3 import PPO
 import numpy as np
 from utils import *
 
+# Arsonist decisions are logged at debug level, enable it to follow an arsonist step by step
+logger = logging.getLogger(__name__)
+
 INJURY_POINTS = 50 # Injury points received when encountering an arsonist
+HOSPITAL_CAPACITY = 4 # Beds per hospital
+HEAL_RATE = 1 # Injury points healed per bed and step
+
+# Reward proxy of recorded arsonist transitions, same scale as ArsonistEnv
+IGNITION_REWARD = 50
+STEP_REWARD = -0.1
+ARREST_REWARD = -100
+
+# (dx, dy) of the move actions. UP is y-1 here while ArsonistEnv, where the policy was trained, moves x-1
+ACTION_DELTAS = {1: (0, -1), 2: (0, 1), 3: (-1, 0), 4: (1, 0)}
+ENV_ACTION_DELTAS = {1: (-1, 0), 2: (1, 0), 3: (0, -1), 4: (0, 1)}
 
 Agent.move_randomly = move_randomly
 Agent.move_towards = move_towards
+Agent.travel = travel
 
 class TreeAgent(Agent):
     def __init__(self, model):
         super().__init__(model)
-        self.on_fire = False
+        self._on_fire = False
+
+    @property
+    def on_fire(self):
+        return self._on_fire
+
+    @on_fire.setter
+    def on_fire(self, value):
+        # The model tracks the burning cells, e.g. for the evacuation distance field
+        if value != self._on_fire:
+            self._on_fire = value
+            self.model.fire_changed(self)
 
     def step(self):
         pass
@@ -38,6 +65,49 @@ class FirestationAgent(Agent):
         pass
 
 class HospitalAgent(Agent):
+    def __init__(self, model, capacity=HOSPITAL_CAPACITY, heal_rate=HEAL_RATE):
+        super().__init__(model)
+        self.capacity = capacity
+        self.heal_rate = heal_rate
+        self.beds = []
+        self.queue = deque() # Patients dropped off while every bed is taken
+        self.admitted = 0
+        self.treated = 0
+        self.total_time_to_treatment = 0 # Steps from injury to a bed, summed over admitted patients
+
+    def admit(self, patient):
+        self.queue.append(patient)
+        self.model.activate(self)
+
+    def expected_wait(self):
+        # Steps until a new arrival gets a bed, assuming the beds free up evenly
+        if len(self.beds) + len(self.queue) < self.capacity:
+            return 0
+        work = sum(patient.injury_points for patient in self.beds) + sum(patient.injury_points for patient in self.queue)
+        return work / (self.capacity * self.heal_rate)
+
+    def step(self):
+        while self.queue and len(self.beds) < self.capacity:
+            patient = self.queue.popleft()
+            self.beds.append(patient)
+            self.admitted += 1
+            self.total_time_to_treatment += self.model.steps - patient.injured_at
+
+        for patient in self.beds:
+            patient.injury_points = max(0, patient.injury_points - self.heal_rate)
+
+        # Discharged patients go back to what they were doing
+        for patient in [patient for patient in self.beds if patient.injury_points == 0]:
+            self.beds.remove(patient)
+            patient.in_care = False
+            patient.injured_at = None
+            self.treated += 1
+            self.model.activate(patient)
+
+        if not self.beds and not self.queue:
+            self.model.deactivate(self)
+
+class ShelterAgent(Agent):
     def __init__(self, model):
         super().__init__(model)
 
@@ -47,14 +117,18 @@ class HospitalAgent(Agent):
 class CitizenAgent(Agent):
     def __init__(self, model):
         super().__init__(model)
-        self.is_injured = False
         # If injury points is 0, then the citizen is healthy
         self.injury_points = 0
+        self.injured_at = None # Model step of the injury
+        self.in_care = False # Carried by an ambulance or at a hospital
 
     def step(self):
-        # If the agent is not injured, he can walk
+        # If the agent is not injured, he can walk, towards the nearest shelter when a fire is close
         if self.injury_points < 1:
-            self.move_randomly()
+            if self.model.in_danger(self.pos):
+                self.model.grid.move_agent(self, self.model.evacuation.next_position(self.pos))
+            else:
+                self.move_randomly()
 
         # Check for problems around the agent
         neighbors = self.model.grid.get_neighbors(self.pos, moore=True, include_center=True)
@@ -65,38 +139,42 @@ class CitizenAgent(Agent):
             if isinstance(agent, ArsonistAgent):
                 self.model.commander.report_arsonist(agent.pos)
 
-            if isinstance(agent, CitizenAgent) and agent.injury_points > 0:
-                self.model.commander.report_injured(agent.pos)
-
-            if isinstance(agent, FirefighterAgent) and agent.injury_points > 0:
+            if needs_ambulance(agent):
                 self.model.commander.report_injured(agent.pos)
 
-        # Check current cell for arsonist to become injured or hospital to heal
+        # Check current cell for arsonist to become injured
         cell_agents = self.model.grid.get_cell_list_contents(self.pos)
         for agent in cell_agents:
             if isinstance(agent, ArsonistAgent):
-                self.injury_points = INJURY_POINTS
+                injure(self)
                 break  # No need to check further
-            if isinstance(agent, HospitalAgent):
-                self.injury_points -= 1
-                break
 
 class ArsonistAgent(Agent):
+    action_deltas = ACTION_DELTAS
+
     def __init__(self, model, rl_model, prison_position):
         super().__init__(model)
         self.ppo_model = rl_model
         self.is_arrested = False
+        self.arrested_at = None # Model step of the arrest
+        self.ignitions = 0
         self.prison_position = prison_position
 
     def step(self):
         if self.is_arrested:
+            self.model.deactivate(self)
             return
         
         obs = self.get_partial_observation() # 10x10 flattened
 
         action, _ = self.ppo_model.predict(obs, deterministic=True)
-        print(action)
-        self.perform_action(action)
+        ignited = self.perform_action(action)
+        if ignited:
+            self.ignitions += 1
+
+        if self.model.recorder is not None:
+            reward = IGNITION_REWARD if ignited else STEP_REWARD
+            self.model.recorder.record(self.unique_id, obs, action, reward)
         
         '''# Look for policemen within 3 cells (Moore neighborhood)
         police_neighbors = self.model.grid.get_neighbors(self.pos, moore=True, include_center=False, radius=3)
@@ -129,25 +207,9 @@ class ArsonistAgent(Agent):
         # Create a numerical 2D representation of the grid (e.g., 0=empty, 1=tree, 2=burning, etc.)
         grid_array = np.zeros((width, height), dtype=np.float32)
         
-        for x in range(width):
-            for y in range(height):
-                cell = self.model.grid.get_cell_list_contents((x, y))
-                if not cell:
-                    grid_array[x, y] = 0
-                else:
-                    # Simple mapping based on agent type - match training environment
-                    for agent in cell:  # Check all agents in cell
-                        if isinstance(agent, TreeAgent):
-                            if agent.on_fire:
-                                grid_array[x, y] = 2  # Burning tree
-                            else:
-                                grid_array[x, y] = 1  # Normal tree
-                        elif isinstance(agent, PolicemanAgent):
-                            grid_array[x, y] = 3  # Cop
-                        elif isinstance(agent, CitizenAgent):
-                            grid_array[x, y] = 4  # Citizen
-                        elif isinstance(agent, FirefighterAgent):
-                            grid_array[x, y] = 5  # Firefighter
+        for cell, (x, y) in self.model.grid.coord_iter():
+            if cell:
+                grid_array[x, y] = observation_code(cell)
 
         # Pad grid so we can always extract a centered 10x10
         padded = np.pad(grid_array, pad_width=5, mode='constant', constant_values=0)
@@ -167,18 +229,12 @@ class ArsonistAgent(Agent):
         4 = move right
         5 = set fire to nearby trees
         """
-        if action == 0:
-            pass  # do nothing
-        elif action == 1:
-            self.move(0, -1)  # move up
-        elif action == 2:
-            self.move(0, 1)   # move down
-        elif action == 3:
-            self.move(-1, 0)  # move left
-        elif action == 4:
-            self.move(1, 0)   # move right
+        action = int(action)
+        if action in self.action_deltas:
+            self.move(*self.action_deltas[action])
         elif action == 5:
-            self.set_fire()
+            return self.set_fire()
+        return False
 
     def set_fire(self):
         """Improved fire setting with proper tree checking"""
@@ -191,8 +247,8 @@ class ArsonistAgent(Agent):
             if isinstance(agent, TreeAgent) and not agent.on_fire:
                 agent.on_fire = True
                 ignited = True
-                print(f"Arsonist ignited tree at {self.pos}")
-                return
+                logger.debug("Arsonist ignited tree at %s", self.pos)
+                return True
         
         # If no tree in current cell, check adjacent cells
         for dx in [-1, 0, 1]:
@@ -209,11 +265,22 @@ class ArsonistAgent(Agent):
                     if isinstance(agent, TreeAgent) and not agent.on_fire:
                         agent.on_fire = True
                         ignited = True
-                        print(f"Arsonist ignited adjacent tree at ({check_x}, {check_y})")
-                        return
+                        logger.debug("Arsonist ignited adjacent tree at (%d, %d)", check_x, check_y)
+                        return True
         
         if not ignited:
-            print(f"Arsonist tried to ignite but no trees nearby at {self.pos}")
+            logger.debug("Arsonist tried to ignite but no trees nearby at %s", self.pos)
+        return ignited
+
+    def arrest(self, prison_position):
+        if self.is_arrested: # Policemen following old reports find it in prison
+            return
+        self.model.grid.move_agent(self, prison_position)
+        self.is_arrested = True
+        self.arrested_at = self.model.steps
+        self.model.deactivate(self)
+        if self.model.recorder is not None:
+            self.model.recorder.end_episode(self.unique_id, ARREST_REWARD)
 
     def move(self, dx, dy):
         """Improved movement with bounds checking"""
@@ -221,18 +288,18 @@ class ArsonistAgent(Agent):
         new_y = self.pos[1] + dy
         
         if self.model.grid.out_of_bounds((new_x, new_y)):
-            print(f"Arsonist tried to move out of bounds to ({new_x}, {new_y})")
+            logger.debug("Arsonist tried to move out of bounds to (%d, %d)", new_x, new_y)
             return
             
         # Check if target cell has immovable objects (buildings)
         target_agents = self.model.grid.get_cell_list_contents((new_x, new_y))
         for agent in target_agents:
-            if isinstance(agent, (PrisonAgent, PolicestationAgent, FirestationAgent, HospitalAgent)):
-                print(f"Arsonist can't move into building at ({new_x}, {new_y})")
+            if isinstance(agent, BUILDINGS):
+                logger.debug("Arsonist can't move into building at (%d, %d)", new_x, new_y)
                 return
         
         self.model.grid.move_agent(self, (new_x, new_y))
-        print(f"Arsonist moved to {self.pos}")
+        logger.debug("Arsonist moved to %s", self.pos)
     
     def run_away_from(self, danger_pos):
         # Get all adjacent cells (Moore neighborhood radius=1)
@@ -244,19 +311,19 @@ class ArsonistAgent(Agent):
             if self.model.grid.out_of_bounds(pos):
                 continue
             cell_agents = self.model.grid.get_cell_list_contents(pos)
-            is_blocked = any(isinstance(agent, (PrisonAgent, PolicestationAgent, FirestationAgent, HospitalAgent)) 
+            is_blocked = any(isinstance(agent, BUILDINGS) 
                            for agent in cell_agents)
             if not is_blocked:
                 accessible_cells.append(pos)
 
         if not accessible_cells:
-            print("Arsonist has nowhere to run!")
+            logger.debug("Arsonist has nowhere to run!")
             return
 
         # Choose the farthest cell from the danger
         farthest = max(accessible_cells, key=lambda pos: manhattan_distance(pos, danger_pos))
         self.model.grid.move_agent(self, farthest)
-        print(f"Arsonist ran away to {self.pos}")
+        logger.debug("Arsonist ran away to %s", self.pos)
 
 
 class FirefighterAgent(Agent):
@@ -265,54 +332,66 @@ class FirefighterAgent(Agent):
         self.goal = None # Coordinates of the fire (goal) that has to be put out
         self.fire_station_position = fire_station_position
         self.injury_points = 0
+        self.injured_at = None
+        self.in_care = False
+        self._vote = None # Fire voted for while waiting for a goal
 
     def step(self):
         if self.injury_points < 1:
             if self.goal:
                 if self.pos != self.goal:
-                    self.move_towards(self.goal)
+                    self.travel(self.goal)
                 else:
                     # At the fire location
                     if self.goal not in self.model.firefighter_presence:
                         self.model.firefighter_presence[self.goal] = set()
                     self.model.firefighter_presence[self.goal].add(self.unique_id)
 
-                    # Check for sufficient firefighters to put out the fire
-                    if len(self.model.firefighter_presence[self.goal]) >= 3:
+                    # Check for sufficient firefighters to put out the fire, small crews need everyone
+                    crew_size = len(self.model.crews[FirefighterAgent][self.fire_station_position])
+                    if len(self.model.firefighter_presence[self.goal]) >= min(3, crew_size):
                         # Extinguish the fire
                         for agent in self.model.grid.get_cell_list_contents(self.goal):
                             if isinstance(agent, TreeAgent) and agent.on_fire:
                                 agent.on_fire = False
                                 self.model.commander.known_fires.discard(self.goal)
+                                self.model.fires_extinguished += 1
                                 break
 
                         # Reset fire info
-                        del self.model.firefighter_presence[self.goal]
+                        goal = self.goal
+                        del self.model.firefighter_presence[goal]
 
-                        # All firefighters on this goal reset
-                        for agent in self.model.agents:
-                            if isinstance(agent, FirefighterAgent): #and agent.goal == self.goal
+                        # Firefighters on this goal reset, other crews keep working on their fires
+                        for agent in self.model.agents_by_type[FirefighterAgent]:
+                            if agent.goal == goal:
                                 agent.goal = None
             else:
-                fire_list = self.model.commander.get_fires()
+                fire_list = self.model.commander.get_fires(self.fire_station_position)
                 if fire_list: # Vote
-                    if not hasattr(self, '_vote') or self._vote is None:
+                    if self._vote is None:
                         # Cast vote if not yet voted this round
-                        self._vote = self.random.choice(self.model.commander.get_fires())
+                        self._vote = self.model.rngs['voting'].choice(fire_list)
                 else:
                     # No fire, return to firestation
                     if self.pos != self.fire_station_position:
-                        self.move_towards(self.fire_station_position)
+                        self.travel(self.fire_station_position)
 
-        # Check current cell for arsonist to become injured or hospital to heal
+        # Check current cell for arsonist to become injured
         cell_agents = self.model.grid.get_cell_list_contents(self.pos)
         for agent in cell_agents:
             if isinstance(agent, ArsonistAgent):
-                self.injury_points = INJURY_POINTS
+                injure(self)
                 break  # No need to check further
-            if isinstance(agent, HospitalAgent):
-                self.injury_points -= 1
-                break
+
+        if self.is_idle():
+            self.model.deactivate(self)
+
+    def is_idle(self):
+        # Injured firefighters wait for an ambulance and the hospital, healthy ones wait at the station for a fire report
+        if self.injury_points > 0:
+            return True
+        return self.goal is None and self.pos == self.fire_station_position and not self.model.commander.get_fires(self.fire_station_position)
 
 class PolicemanAgent(Agent):
     def __init__(self, model, policestation_position, prison_position):
@@ -326,47 +405,78 @@ class PolicemanAgent(Agent):
             if self.pos == self.target_arsonist: # We arrived at the target location
                 self.target_arsonist = None
             else:
-                self.move_towards(self.target_arsonist)
+                self.travel(self.target_arsonist)
         else:
-            self.target_arsonist = self.model.commander.get_arsonist_position()
+            self.target_arsonist = self.model.commander.get_arsonist_position(self.policestation_position)
             if self.target_arsonist is not None:
-                self.move_towards(self.target_arsonist)
+                self.travel(self.target_arsonist)
 
         # Check if arsonist is at current position
         cell_agents = self.model.grid.get_cell_list_contents(self.pos)
         for agent in cell_agents:
             if isinstance(agent, ArsonistAgent):
                 # Move arsonist to prison
-                self.model.grid.move_agent(agent, self.prison_position)
-                agent.is_arrested = True
+                agent.arrest(self.prison_position)
                 self.target_arsonist = None
 
+        if self.is_idle():
+            self.model.deactivate(self)
+
         '''if self.target_arsonist is None:
             self.move_towards(self.policestation_position)'''
-        
+
+    def is_idle(self):
+        # A free arsonist could still walk into an idle policeman standing outside a building
+        if self.target_arsonist is not None or self.model.commander.get_arsonist_positions(self.policestation_position):
+            return False
+        cell_agents = self.model.grid.get_cell_list_contents(self.pos)
+        if any(isinstance(agent, BUILDINGS) for agent in cell_agents):
+            return True
+        return all(agent.is_arrested for agent in self.model.agents_by_type.get(ArsonistAgent, ()))
+
 class AmbulanceAgent(Agent):
     def __init__(self, model, hospital_position):
         super().__init__(model)
         self.hospital_position = hospital_position
         self.target_patient = None
+        self.patient = None # Patient being carried
+        self.destination = None # HospitalAgent the patient is taken to
 
     def step(self):
-        if self.target_patient is not None:
+        if self.patient is not None:
+            self.travel(self.destination.pos)
+            self.model.grid.move_agent(self.patient, self.pos)
+            if self.pos == self.destination.pos:
+                self.destination.admit(self.patient)
+                self.patient = self.destination = None
+        elif self.target_patient is not None:
             if self.pos == self.target_patient:
                 self.target_patient = None
             else:
-                self.move_towards(self.target_patient)
+                self.travel(self.target_patient)
         else:
-            self.target_patient = self.model.commander.get_injured_position()
+            self.target_patient = self.model.commander.get_injured_position(self.pos)
             if self.target_patient is not None:
-                self.move_towards(self.target_patient)
+                self.travel(self.target_patient)
 
-        # Check if patient is at current position
-        cell_agents = self.model.grid.get_cell_list_contents(self.pos)
-        for agent in cell_agents:
-            if (isinstance(agent, CitizenAgent) or isinstance(agent, FirefighterAgent)) and agent.injury_points > 0:
-                # Move patient to the hospital
-                self.model.grid.move_agent(agent, self.hospital_position)
+        # Pick up a patient at the current position
+        if self.patient is None and self.model.hospitals:
+            patients = [agent for agent in self.model.grid.get_cell_list_contents(self.pos) if needs_ambulance(agent)]
+            if patients:
+                self.pick_up(patients[0])
+                if len(patients) > 1:
+                    self.model.commander.report_injured(self.pos)
+
+        if self.patient is None and self.target_patient is None and not self.model.commander.known_injured:
+            self.model.deactivate(self)
+
+    def pick_up(self, patient):
+        self.patient = patient
+        self.target_patient = None
+        patient.in_care = True
+        self.model.deactivate(patient)
+        # The hospital with the shortest trip plus wait for a bed
+        self.destination = min(self.model.hospitals, key=lambda hospital: self.model.travel_time(self.pos, hospital.pos) + hospital.expected_wait())
 
 class CommanderAgent(Agent):
     def __init__(self, model):
@@ -376,35 +486,66 @@ class CommanderAgent(Agent):
         self.known_injured = set()
 
     def report_fire(self, pos):
-        self.known_fires.add(pos)
-
-    def get_fires(self):
-        return list(self.known_fires)
+        if pos not in self.known_fires:
+            self.known_fires.add(pos)
+            self.model.wake(FirefighterAgent, pos)
+
+    def get_fires(self, station=None):
+        # Known fires, only those in the response zone of a fire station if given
+        if station is None:
+            return list(self.known_fires)
+        return [pos for pos in self.known_fires if self.model.station_of(FirefighterAgent, pos) == station]
     
     def report_arsonist(self, pos):
         self.known_arsonist_positions.append(pos)
-
-    def get_arsonist_position(self):
-        if len(self.known_arsonist_positions) > 0:
-            return self.known_arsonist_positions.pop(0)
-        else:
-            return None
+        self.model.wake(PolicemanAgent, pos)
+
+    def get_arsonist_positions(self, station=None):
+        if station is None:
+            return list(self.known_arsonist_positions)
+        return [pos for pos in self.known_arsonist_positions if self.model.station_of(PolicemanAgent, pos) == station]
+
+    def get_arsonist_position(self, station=None):
+        # Oldest report, in the response zone of a police station if given
+        for i, pos in enumerate(self.known_arsonist_positions):
+            if station is None or self.model.station_of(PolicemanAgent, pos) == station:
+                return self.known_arsonist_positions.pop(i)
+        return None
         
     def report_injured(self, pos):
-        self.known_injured.add(pos)
+        if pos not in self.known_injured:
+            self.known_injured.add(pos)
+            self.model.wake(AmbulanceAgent)
 
-    def get_injured_position(self):
+    def get_injured_position(self, origin=None):
         #return self.known_injured
         if len(self.known_injured) > 0:
+            if origin is not None and self.model.roads is not None:
+                # Closest patient by travel time
+                nearest = self.model.roads.closest(origin, self.known_injured)
+                self.known_injured.discard(nearest)
+                return nearest
             return self.known_injured.pop()
         else:
             return None
     
-    def tally_votes(self):
+    def dispatch(self, crew, station=None):
+        # The fire the crew voted for, or the one with the best simulated outcome when the model has a planner
+        winning = self.tally_votes(crew)
+        if winning is None or self.model.planner is None:
+            return winning
+        candidates = self.get_fires(station)
+        if len(candidates) < 2:
+            return winning
+        return self.model.planner.choose(self.model, station, candidates, winning) or winning
+
+    def tally_votes(self, crew=None):
+        if crew is None:
+            crew = self.model.agents_by_type.get(FirefighterAgent, ())
         votes = [
             agent._vote
-            for agent in self.model.agents
-            if isinstance(agent, FirefighterAgent) and getattr(agent, '_vote', None)
+            for agent in crew
+            if getattr(agent, '_vote', None)
         ]
         if not votes:
             return None
@@ -412,4 +553,57 @@ class CommanderAgent(Agent):
         return winning
 
     def step(self):
-        pass
\ No newline at end of file
+        pass
+
+def injure(agent):
+    if agent.injury_points < 1:
+        agent.injured_at = agent.model.steps
+    agent.injury_points = INJURY_POINTS
+
+def needs_ambulance(agent):
+    return isinstance(agent, (CitizenAgent, FirefighterAgent)) and agent.injury_points > 0 and not agent.in_care
+
+# Agents that move, see DisasterModel.snapshot_positions
+MOBILE = (CitizenAgent, ArsonistAgent, FirefighterAgent, PolicemanAgent, AmbulanceAgent)
+
+# Buildings block the arsonist, only hospitals step while they have patients
+BUILDINGS = (PrisonAgent, PolicestationAgent, FirestationAgent, HospitalAgent, ShelterAgent)
+
+# Codes of the occupancy state layer, the first six match the ArsonistEnv grid values
+OCCUPANCY_CODES = {
+    TreeAgent: 1,
+    PolicemanAgent: 3,
+    CitizenAgent: 4,
+    FirefighterAgent: 5,
+    ArsonistAgent: 6,
+    PrisonAgent: 7,
+    PolicestationAgent: 8,
+    FirestationAgent: 9,
+    HospitalAgent: 10,
+    AmbulanceAgent: 11,
+    ShelterAgent: 12,
+}
+
+def observation_code(cell):
+    # Simple mapping based on agent type - match training environment
+    code = 0
+    for agent in cell:  # Check all agents in cell
+        if isinstance(agent, TreeAgent):
+            code = 2 if agent.on_fire else 1  # Burning or normal tree
+        elif isinstance(agent, PolicemanAgent):
+            code = 3  # Cop
+        elif isinstance(agent, CitizenAgent):
+            code = 4  # Citizen
+        elif isinstance(agent, FirefighterAgent):
+            code = 5  # Firefighter
+    return code
+
+def occupancy_code(cell):
+    # The last agent of the cell is the one drawn on top
+    code = 0
+    for agent in cell:
+        agent_code = OCCUPANCY_CODES.get(type(agent), 0)
+        if agent_code == 1 and agent.on_fire:
+            agent_code = 2
+        code = agent_code or code
+    return code
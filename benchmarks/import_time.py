@@ -0,0 +1,57 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Modules started by our scripts and workers, imported from the repository root
+ENTRY_POINTS = ['model', 'evaluate', 'sharding', 'inference_server', 'metrics', 'rollouts', 'dashboard', 'pygame_ui', 'nn.arsonist_env', 'nn.ppo']
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def import_time(module):
+    """Cumulative import time of module in microseconds and its heaviest dependencies, from python -X importtime"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'], cwd=ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f'import {module} failed:\n{result.stderr.splitlines()[-1]}')
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_us, name = line.split('|')
+        cumulative[name.strip()] = int(cumulative_us)
+    return cumulative[module], cumulative
+
+def benchmark(modules, repeat=5, top=5):
+    results = {}
+    for module in modules:
+        times, last = [], None
+        for _ in range(repeat):
+            total, last = import_time(module)
+            times.append(total)
+        heaviest = sorted(((us, name) for name, us in last.items() if name != module), reverse=True)[:top]
+        results[module] = {'median_ms': statistics.median(times) / 1000, 'heaviest': {name: us / 1000 for us, name in heaviest}}
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Import time of every entry point, median of fresh interpreters')
+    parser.add_argument('modules', nargs='*', default=ENTRY_POINTS)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=5, help='heaviest dependencies to list per module')
+    parser.add_argument('--json', help='write the results to this file to track regressions')
+    args = parser.parse_args()
+
+    results = {}
+    for module in args.modules:
+        try:
+            results.update(benchmark([module], args.repeat, args.top))
+        except RuntimeError as e:
+            print(e)
+            continue
+        print(f'{module:<18} {results[module]["median_ms"]:8.1f} ms')
+        for name, ms in results[module]['heaviest'].items():
+            print(f'    {name:<40} {ms:8.1f} ms')
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,63 @@
+import argparse
+import gc
+import json
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents import (TreeAgent, PrisonAgent, PolicestationAgent, FirestationAgent, HospitalAgent, ShelterAgent, CitizenAgent,
+                    ArsonistAgent, FirefighterAgent, PolicemanAgent, AmbulanceAgent, CommanderAgent)
+from model import DisasterModel
+
+# Constructor arguments after the model
+AGENT_ARGS = {
+    TreeAgent: (),
+    PrisonAgent: (),
+    PolicestationAgent: (),
+    FirestationAgent: (),
+    HospitalAgent: (),
+    ShelterAgent: (),
+    CitizenAgent: (),
+    ArsonistAgent: (None, (0, 0)),
+    FirefighterAgent: ((0, 0),),
+    PolicemanAgent: ((0, 0), (0, 0)),
+    AmbulanceAgent: ((0, 0),),
+    CommanderAgent: (),
+}
+
+def bytes_per_agent(agent_type, count):
+    """Memory allocated per agent created, placed on the grid and registered with the model"""
+    model = DisasterModel(100, 100, num_trees=0, num_prison=0, num_policestations=0, num_firestations=0, num_hospitals=0,
+                          num_citizens=0, num_arsonists=0, num_firefighters=0, num_policemen=0, num_ambulances=0, policy=object())
+    # Warm up the per-type structures of the model so they are not counted
+    model.place_agent(agent_type(model, *AGENT_ARGS[agent_type]), (0, 0))
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    agents = []
+    for i in range(count):
+        agent = agent_type(model, *AGENT_ARGS[agent_type])
+        model.place_agent(agent, (i % 100, i // 100 % 100))
+        agents.append(agent)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    total = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    # The list holding the agents is not part of their footprint
+    return (total - sys.getsizeof(agents)) / count
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Bytes per agent of every agent type')
+    parser.add_argument('--count', type=int, default=20000)
+    parser.add_argument('--json', help='write the results to this file to compare runs')
+    args = parser.parse_args()
+
+    results = {}
+    for agent_type in AGENT_ARGS:
+        results[agent_type.__name__] = bytes_per_agent(agent_type, args.count)
+        print(f'{agent_type.__name__:<20} {results[agent_type.__name__]:8.0f} bytes')
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,131 @@
+import numpy as np
+from agents import ArsonistAgent, FirefighterAgent, INJURY_POINTS, injure, needs_ambulance
+
+# (dx, dy) of the Moore neighbourhood
+NEIGHBOURS = np.array([(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1) if dx or dy])
+
+def dilate(mask, radius=1):
+    # Cells within radius steps (Chebyshev) of a True cell
+    width, height = mask.shape
+    padded = np.pad(mask, radius)
+    out = np.zeros_like(mask)
+    for dx in range(2 * radius + 1):
+        for dy in range(2 * radius + 1):
+            out |= padded[dx:dx + width, dy:dy + height]
+    return out
+
+class CitizenStage:
+    """
+    Steps every citizen of a DisasterModel at once instead of through CitizenAgent.step. Positions and
+    injury points live in NumPy arrays, all random moves are drawn in one call and clipped at the border,
+    and what the citizens see is computed on whole-grid masks. The agents and the grid are only written
+    for the citizens that moved or got injured. Citizens taken out by model.deactivate (carried by an
+    ambulance, in a hospital) are skipped until model.activate reloads them.
+    """
+
+    def __init__(self, model, capacity=1024):
+        self.model = model
+        self.agents = []
+        self.rows = {} # agent -> row in the arrays
+        self.pos = np.zeros((capacity, 2), dtype=np.int64)
+        self.injury = np.zeros(capacity, dtype=np.int64)
+        self.active = np.zeros(capacity, dtype=bool)
+        # Seeded from the model's movement stream
+        self.rng = np.random.default_rng(model.rngs['movement'].getrandbits(64))
+
+    def __len__(self):
+        return len(self.agents)
+
+    def __contains__(self, agent):
+        return agent in self.rows
+
+    def add(self, agent):
+        row = len(self.agents)
+        if row == len(self.pos):
+            self.pos = np.concatenate([self.pos, np.zeros_like(self.pos)])
+            self.injury = np.concatenate([self.injury, np.zeros_like(self.injury)])
+            self.active = np.concatenate([self.active, np.zeros_like(self.active)])
+        self.agents.append(agent)
+        self.rows[agent] = row
+        self.resume(agent)
+
+    def remove(self, agent):
+        # The last row takes the place of the removed one
+        row = self.rows.pop(agent)
+        last = len(self.agents) - 1
+        if row != last:
+            moved = self.agents[last]
+            self.agents[row] = moved
+            self.rows[moved] = row
+            self.pos[row], self.injury[row], self.active[row] = self.pos[last], self.injury[last], self.active[last]
+        self.agents.pop()
+        self.active[last] = False
+
+    def suspend(self, agent):
+        self.active[self.rows[agent]] = False
+
+    def resume(self, agent):
+        # Reload what others may have changed while it was suspended
+        row = self.rows[agent]
+        self.pos[row] = agent.pos
+        self.injury[row] = agent.injury_points
+        self.active[row] = True
+
+    def _sync_grid(self, rows):
+        # Through the public grid API, so Mesa keeps its own bookkeeping (e.g. the empty cells) right
+        move_agent = self.model.grid.move_agent
+        for row, (x, y) in zip(rows.tolist(), self.pos[rows].tolist()):
+            move_agent(self.agents[row], (x, y))
+
+    def step(self):
+        model = self.model
+        grid = model.grid
+        count = len(self.agents)
+        pos, injury, active = self.pos[:count], self.injury[:count], self.active[:count]
+
+        # Healthy citizens walk to a random neighbouring cell, or down the evacuation field when a fire is close
+        healthy = active & (injury < 1)
+        evacuating = np.zeros_like(healthy)
+        if model.danger is not None:
+            evacuating = healthy & model.danger[pos[:, 0], pos[:, 1]]
+        walking = np.flatnonzero(healthy & ~evacuating)
+        evacuating = np.flatnonzero(evacuating)
+        steps = NEIGHBOURS[self.rng.integers(len(NEIGHBOURS), size=len(walking))]
+        new_pos = np.clip(pos[walking] + steps, 0, (grid.width - 1, grid.height - 1))
+        if len(evacuating):
+            walking = np.concatenate([walking, evacuating])
+            new_pos = np.concatenate([new_pos, model.evacuation.next_positions(pos[evacuating])])
+        moved = walking[(new_pos != pos[walking]).any(axis=1)]
+        pos[walking] = new_pos
+        self._sync_grid(moved)
+
+        # Report what is within one cell of any citizen
+        observers = np.zeros((grid.width, grid.height), dtype=bool)
+        observers[pos[active, 0], pos[active, 1]] = True
+        seen = dilate(observers)
+
+        fires = np.zeros_like(seen)
+        for fire in model.burning:
+            fires[fire] = True
+        arsonists = np.zeros_like(seen)
+        for agent in model.agents_by_type.get(ArsonistAgent, ()):
+            arsonists[agent.pos] = True
+        injured = np.zeros_like(seen)
+        injured[pos[active & (injury > 0), 0], pos[active & (injury > 0), 1]] = True
+        for agent in model.agents_by_type.get(FirefighterAgent, ()):
+            if needs_ambulance(agent):
+                injured[agent.pos] = True
+
+        commander = model.commander
+        for x, y in np.argwhere(fires & seen).tolist():
+            commander.report_fire((x, y))
+        for x, y in np.argwhere(arsonists & seen).tolist():
+            commander.report_arsonist((x, y))
+        for x, y in np.argwhere(injured & seen).tolist():
+            commander.report_injured((x, y))
+
+        # Citizens sharing a cell with an arsonist get injured
+        hurt = np.flatnonzero(active & arsonists[pos[:, 0], pos[:, 1]])
+        for row in hurt.tolist():
+            injure(self.agents[row])
+        injury[hurt] = INJURY_POINTS
@@ -0,0 +1,141 @@
+import os
+import threading
+import time
+import numpy as np
+import solara
+import headless
+from metrics import SharedRingBufferSink
+from state_buffer import StateBuffer
+
+# Run with `solara run dashboard.py`. The simulation runs headless in its own process (see headless.py) and
+# publishes its state and metrics in shared memory, every browser session reads frames from there at its own
+# pace and only sends the cells and metrics rows that changed since its previous update, plus a full frame
+# and chart every KEYFRAME_SECONDS in case an update never made it to the browser. Set DISASTER_STATE_BUFFER (and
+# DISASTER_METRICS for the chart) to the names printed by `python headless.py` to watch that model instead.
+GRID_WIDTH, GRID_HEIGHT = 50, 50
+CELL_SIZE = 12
+STEPS_PER_SECOND = 10 # Pace of the simulation started by the dashboard, None to run flat out
+KEYFRAME_SECONDS = 5
+CHART_STEPS = 500 # Steps shown in the metrics chart
+CHART_SERIES = ('active_fires', 'burned_area', 'injured')
+CHART_COLORS = ['#ff5a1f', '#8d6e63', '#ffffff']
+
+# Occupancy code -> color, see agents.OCCUPANCY_CODES
+COLORS = {
+    0: '#1e1e1e', # Empty
+    1: '#2e7d32', # Tree
+    2: '#2e7d32', # Burning tree, fire is drawn on top
+    3: '#1565c0', # Policeman
+    4: '#bdbdbd', # Citizen
+    5: '#ef6c00', # Firefighter
+    6: '#000000', # Arsonist
+    7: '#6d4c41', # Prison
+    8: '#0d47a1', # Police station
+    9: '#b71c1c', # Fire station
+    10: '#f5f5f5', # Hospital
+    11: '#ffeb3b', # Ambulance
+    12: '#8e24aa', # Shelter
+}
+
+class ExternalSimulation:
+    """A model running in another process, read through its StateBuffer and, if given, its metrics"""
+
+    def __init__(self, state_name, metrics_name=None):
+        self.state_buffer = StateBuffer(name=state_name)
+        self.metrics = SharedRingBufferSink(name=metrics_name) if metrics_name else None
+
+class Simulation(ExternalSimulation):
+    """Headless DisasterModel started by the dashboard in its own process, so sessions never slow it down"""
+
+    def __init__(self, steps_per_second=STEPS_PER_SECOND):
+        self.process, state_name, metrics_name = headless.start(steps_per_second, width=GRID_WIDTH, height=GRID_HEIGHT,
+                                                                num_trees=GRID_WIDTH * GRID_HEIGHT // 4, num_citizens=100)
+        super().__init__(state_name, metrics_name)
+
+_simulation = None
+_simulation_lock = threading.Lock()
+
+def get_simulation():
+    global _simulation
+    with _simulation_lock:
+        if _simulation is None:
+            name = os.environ.get('DISASTER_STATE_BUFFER')
+            _simulation = ExternalSimulation(name, os.environ.get('DISASTER_METRICS')) if name else Simulation()
+        return _simulation
+
+def chart_rows(rows):
+    # [step, *CHART_SERIES] per metrics row, as sent to the chart
+    return np.stack([rows['step'], *(rows[name] for name in CHART_SERIES)], axis=1).astype(np.int64).tolist()
+
+def frame_patches(layers, previous):
+    # Cells that differ from the previous frame sent to this client, every cell for the first one
+    if previous is None:
+        changed = np.ones(layers['occupancy'].shape, dtype=bool)
+    else:
+        changed = np.zeros(layers['occupancy'].shape, dtype=bool)
+        for key, layer in layers.items():
+            changed |= layer != previous[key]
+    x, y = np.nonzero(changed)
+    return np.stack([x, y, layers['occupancy'][x, y], layers['fire'][x, y], layers['injured'][x, y]], axis=1).tolist()
+
+@solara.component_vue('grid_canvas.vue')
+def GridCanvas(width: int, height: int, cell_size: int, patches: list, colors: dict):
+    pass
+
+@solara.component_vue('metrics_chart.vue')
+def MetricsChart(width: int, height: int, update: dict, series: list, colors: list, window: int):
+    pass
+
+@solara.component
+def Page():
+    simulation = get_simulation()
+    fps, set_fps = solara.use_state(10)
+    patches, set_patches = solara.use_state([])
+    step, set_step = solara.use_state(0)
+    chart_update, set_chart_update = solara.use_state(None)
+    previous = solara.use_ref(None)
+    sequence = solara.use_ref(-1)
+
+    def poll(cancel):
+        # Throttled to this client's frame rate, never blocks the simulation loop
+        last_chart = 0.0
+        last_keyframe = float('-inf')
+        metrics_total = 0 # Metrics rows this session has sent
+        while not cancel.wait(1 / fps):
+            # Updates are relative to what this session sent, not to what the browser drew, a full frame and
+            # chart now and then repair them if an update was dropped or coalesced on the way
+            keyframe = time.monotonic() - last_keyframe > KEYFRAME_SECONDS
+            if keyframe:
+                last_keyframe = time.monotonic()
+                previous.current = None
+
+            # Only the rows written since the previous update, the browser keeps the rest
+            if simulation.metrics is not None and (keyframe or time.monotonic() - last_chart > 1.0):
+                last_chart = time.monotonic()
+                since = max(simulation.metrics.total - CHART_STEPS, 0) if keyframe else metrics_total
+                metrics_total, rows = simulation.metrics.rows_since(since)
+                if keyframe or len(rows):
+                    set_chart_update({'keyframe': keyframe, 'rows': chart_rows(rows)})
+
+            if not keyframe and not simulation.state_buffer.changed_since(sequence.current):
+                continue
+            frame = simulation.state_buffer.read()
+            if frame is None:
+                continue
+            sequence.current, frame_step, layers = frame
+            diff = frame_patches(layers, previous.current)
+            previous.current = layers
+            if diff:
+                set_patches(diff)
+            set_step(frame_step)
+
+    solara.use_thread(poll, dependencies=[fps])
+
+    with solara.Column():
+        solara.Markdown(f'## Disaster simulation, step {step}')
+        solara.SliderInt('Frames per second', value=fps, on_value=set_fps, min=1, max=30)
+        with solara.Row():
+            GridCanvas(width=simulation.state_buffer.width, height=simulation.state_buffer.height, cell_size=CELL_SIZE,
+                       patches=patches, colors=COLORS)
+            if simulation.metrics is not None:
+                MetricsChart(width=500, height=250, update=chart_update, series=list(CHART_SERIES), colors=CHART_COLORS, window=CHART_STEPS)
@@ -0,0 +1,96 @@
+import heapq
+from collections import deque
+import numpy as np
+
+UNREACHABLE = np.iinfo(np.int32).max // 2
+
+# Staying put first, so ties keep an agent where it is
+MOVES = np.array([(0, 0)] + [(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1) if dx or dy])
+
+class DistanceField:
+    """
+    Steps from every cell to the nearest shelter, moving to any of the 8 neighbours like move_towards and
+    around blocked (burning) cells. Built once for the whole grid, then repaired locally by block and
+    unblock as fires start and go out, so any number of evacuees can descend it at the cost of one lookup.
+    """
+
+    def __init__(self, width, height, sources):
+        self.width = width
+        self.height = height
+        self.sources = set(sources)
+        self.blocked = np.zeros((width, height), dtype=bool)
+        # Nothing is blocked yet, so the distance is the Chebyshev distance to the closest source
+        xs, ys = np.indices((width, height))
+        self.distance = np.full((width, height), UNREACHABLE, dtype=np.int32)
+        for x, y in self.sources:
+            np.minimum(self.distance, np.maximum(abs(xs - x), abs(ys - y)), out=self.distance)
+
+    def _neighbours(self, cell):
+        x, y = cell
+        for dx, dy in MOVES[1:].tolist():
+            cx, cy = x + dx, y + dy
+            if 0 <= cx < self.width and 0 <= cy < self.height and not self.blocked[cx, cy]:
+                yield (cx, cy)
+
+    def _relax(self, heap):
+        # Dijkstra with unit steps from the cells in the heap, only lowering distances
+        while heap:
+            distance, cell = heapq.heappop(heap)
+            if distance > self.distance[cell]:
+                continue
+            for neighbour in self._neighbours(cell):
+                if distance + 1 < self.distance[neighbour]:
+                    self.distance[neighbour] = distance + 1
+                    heapq.heappush(heap, (distance + 1, neighbour))
+
+    def block(self, cell):
+        if self.blocked[cell] or cell in self.sources:
+            return
+        self.blocked[cell] = True
+        # Cells that lose every shortest path, found level by level: a cell one step further than an affected
+        # one is affected too unless another neighbour one step closer to a shelter is not
+        affected = {cell: int(self.distance[cell])}
+        queue = deque([cell])
+        while queue:
+            current = queue.popleft()
+            level = affected[current] + 1
+            for neighbour in self._neighbours(current):
+                if neighbour in affected or self.distance[neighbour] != level:
+                    continue
+                if all(parent in affected for parent in self._neighbours(neighbour) if self.distance[parent] == level - 1):
+                    affected[neighbour] = level
+                    queue.append(neighbour)
+        for affected_cell in affected:
+            self.distance[affected_cell] = UNREACHABLE
+
+        # Fill the region back in from its unaffected border
+        heap = []
+        for affected_cell in affected:
+            if self.blocked[affected_cell]:
+                continue
+            best = min((self.distance[n] for n in self._neighbours(affected_cell) if n not in affected), default=UNREACHABLE)
+            if best < UNREACHABLE:
+                self.distance[affected_cell] = best + 1
+                heap.append((int(best) + 1, affected_cell))
+        heapq.heapify(heap)
+        self._relax(heap)
+
+    def unblock(self, cell):
+        if not self.blocked[cell]:
+            return
+        self.blocked[cell] = False
+        best = min((self.distance[n] for n in self._neighbours(cell)), default=UNREACHABLE)
+        if best < UNREACHABLE:
+            self.distance[cell] = best + 1
+            self._relax([(int(best) + 1, cell)])
+
+    def next_positions(self, positions):
+        """The neighbour closest to a shelter for every row of an (n, 2) array of positions"""
+        padded = np.pad(self.distance, 1, constant_values=UNREACHABLE)
+        candidates = positions[:, None, :] + MOVES
+        distances = padded[candidates[..., 0] + 1, candidates[..., 1] + 1]
+        return candidates[np.arange(len(positions)), distances.argmin(axis=1)]
+
+    def next_position(self, pos):
+        x, y = self.next_positions(np.array([pos]))[0].tolist()
+        return (x, y)
@@ -0,0 +1,101 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from agents import ArsonistAgent, ACTION_DELTAS, ENV_ACTION_DELTAS
+from model import DisasterModel
+from nn.numpy_policy import init_worker, worker_policy
+from nn.arsonist_env import ArsonistEnv
+
+METRICS = ('ignitions', 'survival', 'caught')
+
+def run_env_episode(seed, max_steps):
+    env = ArsonistEnv()
+    obs, _ = env.reset(seed=seed)
+    survival = None
+    steps = 0
+    for steps in range(1, max_steps + 1):
+        action, _ = worker_policy().predict(obs, deterministic=True)
+        obs, _, terminated, truncated, _ = env.step(int(action))
+        if survival is None and env.times_caught:
+            survival = steps
+        if terminated or truncated:
+            break
+    return {
+        'ignitions': env.trees_burned,
+        'survival': survival if survival is not None else steps,
+        'caught': env.times_caught > 0,
+        'steps': steps,
+    }
+
+def run_model_episode(seed, max_steps, width, height, num_trees, axes):
+    model = DisasterModel(width, height, num_trees=num_trees, num_arsonists=1, policy=worker_policy(), seed=seed)
+    arsonist = next(iter(model.agents_by_type[ArsonistAgent]))
+    arsonist.action_deltas = ENV_ACTION_DELTAS if axes == 'env' else ACTION_DELTAS
+    while model.steps < max_steps and not arsonist.is_arrested:
+        model.step()
+    return {
+        'ignitions': arsonist.ignitions,
+        'survival': arsonist.arrested_at if arsonist.is_arrested else model.steps,
+        'caught': arsonist.is_arrested,
+        'steps': model.steps,
+    }
+
+def summarize(results, elapsed):
+    summary = {'episodes': len(results)}
+    for metric in METRICS:
+        values = np.array([result[metric] for result in results], dtype=np.float64)
+        # Normal approximation of the 95% confidence interval of the mean
+        half_width = 1.96 * values.std(ddof=1) / np.sqrt(len(values)) if len(values) > 1 else float('nan')
+        summary[metric] = {'mean': values.mean(), 'ci95': (values.mean() - half_width, values.mean() + half_width)}
+    steps = sum(result['steps'] for result in results)
+    summary['episodes_per_second'] = len(results) / elapsed
+    summary['steps_per_second'] = steps / elapsed
+    return summary
+
+def evaluate(setup, episodes, max_steps, workers, policy_path, seed=0, **model_kwargs):
+    seeds = np.random.SeedSequence(seed).generate_state(episodes).tolist()
+    if setup == 'env':
+        args = [(s, max_steps) for s in seeds]
+        run = run_env_episode
+    else:
+        args = [(s, max_steps, model_kwargs['width'], model_kwargs['height'], model_kwargs['num_trees'], setup.split('-')[1]) for s in seeds]
+        run = run_model_episode
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(workers, initializer=init_worker, initargs=(policy_path,)) as executor:
+        results = list(executor.map(run, *zip(*args), chunksize=max(1, episodes // (4 * (workers or os.cpu_count())))))
+    return summarize(results, time.perf_counter() - start)
+
+def print_summary(setup, summary):
+    print(f'{setup}: {summary["episodes"]} episodes, {summary["episodes_per_second"]:.1f} episodes/s, {summary["steps_per_second"]:.0f} steps/s')
+    for metric in METRICS:
+        low, high = summary[metric]['ci95']
+        print(f'    {metric:<10} {summary[metric]["mean"]:8.3f}  [{low:.3f}, {high:.3f}]')
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare ppo_arsonist in ArsonistEnv and in DisasterModel')
+    parser.add_argument('--episodes', type=int, default=1000)
+    parser.add_argument('--max-steps', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--policy', default='nn/ppo_arsonist')
+    parser.add_argument('--width', type=int, default=20)
+    parser.add_argument('--height', type=int, default=20)
+    parser.add_argument('--trees', type=int, default=100)
+    parser.add_argument('--setups', nargs='+', default=['env', 'model-model', 'model-env'],
+                        help='env, model-model (DisasterModel axes) and model-env (ArsonistEnv axes in DisasterModel)')
+    parser.add_argument('--json', help='write the summaries to this file to track regressions')
+    args = parser.parse_args()
+
+    summaries = {}
+    for setup in args.setups:
+        summaries[setup] = evaluate(setup, args.episodes, args.max_steps, args.workers, args.policy, args.seed,
+                                    width=args.width, height=args.height, num_trees=args.trees)
+        print_summary(setup, summaries[setup])
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(summaries, f, indent=2)
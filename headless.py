@@ -0,0 +1,59 @@
+import argparse
+import multiprocessing as mp
+import signal
+import sys
+import time
+from metrics import MetricsCollector, SharedRingBufferSink
+from model import DisasterModel
+
+METRICS_CAPACITY = 2000 # Steps of metrics kept for viewers
+
+def run(steps_per_second=None, conn=None, metrics_capacity=METRICS_CAPACITY, **model_kwargs):
+    """
+    Step a DisasterModel forever, publishing its state layers and metrics in shared memory. The names of
+    the two blocks are sent over conn, or printed for viewers such as the dashboard.
+    """
+    # Turn SIGTERM into an exception so the shared memory is released on stop
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    model = DisasterModel(publish_state=True, metrics=MetricsCollector(SharedRingBufferSink(metrics_capacity), chunk_size=1), **model_kwargs)
+    names = (model.state_buffer.name, model.metrics.sink.name)
+    if conn is not None:
+        conn.send(names)
+        conn.close()
+    else:
+        print(f'DISASTER_STATE_BUFFER={names[0]} DISASTER_METRICS={names[1]}', flush=True)
+
+    try:
+        while True:
+            start = time.perf_counter()
+            model.step()
+            if steps_per_second:
+                time.sleep(max(0.0, 1 / steps_per_second - (time.perf_counter() - start)))
+    finally:
+        model.close()
+
+def start(steps_per_second=None, metrics_capacity=METRICS_CAPACITY, **model_kwargs):
+    """Start run in its own process and return (process, state buffer name, metrics name) once it publishes"""
+    parent_conn, child_conn = mp.Pipe()
+    process = mp.Process(target=run, args=(steps_per_second, child_conn, metrics_capacity), kwargs=model_kwargs, daemon=True)
+    process.start()
+    child_conn.close()
+    try:
+        state_name, metrics_name = parent_conn.recv()
+    except EOFError:
+        raise RuntimeError('Headless model exited before publishing its state') from None
+    finally:
+        parent_conn.close()
+    return process, state_name, metrics_name
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run a DisasterModel without a UI, e.g. for the dashboard')
+    parser.add_argument('--width', type=int, default=50)
+    parser.add_argument('--height', type=int, default=50)
+    parser.add_argument('--trees', type=int, default=625)
+    parser.add_argument('--citizens', type=int, default=100)
+    parser.add_argument('--steps-per-second', type=float, default=None, help='pace of the model, flat out if not given')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    run(args.steps_per_second, width=args.width, height=args.height, num_trees=args.trees, num_citizens=args.citizens, seed=args.seed)
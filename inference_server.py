@@ -0,0 +1,139 @@
+import os
+import queue
+import signal
+import sys
+import tempfile
+import threading
+import time
+import multiprocessing as mp
+from multiprocessing.connection import Listener, Client
+import numpy as np
+
+MODEL_PATH = 'nn/ppo_arsonist'
+
+class PolicyServer:
+    """
+    Serves policy decisions to many processes at once. Requests arriving within `window` seconds
+    of each other are stacked and answered with a single forward pass.
+    """
+
+    def __init__(self, address, model_path=MODEL_PATH, window=0.002, max_batch=512):
+        from stable_baselines3 import PPO
+
+        self.address = address
+        self.policy = PPO.load(model_path)
+        self.window = window
+        self.max_batch = max_batch
+        self.requests = queue.Queue()
+        self.batches = 0
+        self.served = 0
+
+    def serve_forever(self):
+        listener = Listener(self.address, family='AF_UNIX')
+        threading.Thread(target=self._accept, args=(listener,), daemon=True).start()
+        try:
+            while True:
+                self._run_batch(self._collect())
+        finally:
+            listener.close()
+
+    def _accept(self, listener):
+        while True:
+            try:
+                conn = listener.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._receive, args=(conn,), daemon=True).start()
+
+    def _receive(self, conn):
+        # One thread per client, a client waits for its answer before sending the next observation
+        try:
+            while True:
+                obs, deterministic = conn.recv()
+                self.requests.put((conn, obs, deterministic))
+        except Exception:
+            # Gone or sending something that is not a request, either way only this client is dropped
+            conn.close()
+
+    def _collect(self):
+        batch = [self.requests.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self.requests.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run_batch(self, batch):
+        for deterministic in (True, False):
+            requests = [request for request in batch if request[2] == deterministic]
+            if not requests:
+                continue
+            try:
+                obs = np.stack([request[1] for request in requests])
+                actions, _ = self.policy.predict(obs, deterministic=deterministic)
+            except Exception:
+                # A malformed observation spoils the batch, answer one by one so only its client gets the error
+                actions = [self._predict_one(request[1], deterministic) for request in requests]
+            for (conn, _, _), action in zip(requests, actions):
+                try:
+                    conn.send(action)
+                except OSError:
+                    pass # Client went away
+            self.batches += 1
+            self.served += len(requests)
+
+    def _predict_one(self, obs, deterministic):
+        try:
+            actions, _ = self.policy.predict(np.stack([obs]), deterministic=deterministic)
+            return actions[0]
+        except Exception as e:
+            return RuntimeError(f'Policy server could not predict: {e!r}')
+
+def serve(address, model_path=MODEL_PATH, window=0.002, max_batch=512):
+    # Turn SIGTERM into an exception so the socket file is removed on stop
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    PolicyServer(address, model_path, window, max_batch).serve_forever()
+
+def start_server(address=None, model_path=MODEL_PATH, window=0.002, max_batch=512, timeout=60):
+    """Start the server in its own process and return (process, address) once it accepts connections"""
+    if address is None:
+        address = os.path.join(tempfile.mkdtemp(prefix='ppo-arsonist-'), 'policy.sock')
+    process = mp.Process(target=serve, args=(address, model_path, window, max_batch), daemon=True)
+    process.start()
+
+    deadline = time.monotonic() + timeout
+    while not os.path.exists(address):
+        if not process.is_alive() or time.monotonic() > deadline:
+            process.terminate()
+            raise RuntimeError(f'Policy server did not start on {address}')
+        time.sleep(0.05)
+    return process, address
+
+class RemotePolicy:
+    """Drop-in replacement for the PPO model used by ArsonistAgent, forwarding predictions to a PolicyServer"""
+
+    def __init__(self, address):
+        self.address = address
+        self.conn = Client(address, family='AF_UNIX')
+
+    def predict(self, obs, deterministic=True):
+        self.conn.send((np.asarray(obs), deterministic))
+        action = self.conn.recv()
+        if isinstance(action, Exception):
+            raise action
+        return action, None
+
+    def close(self):
+        self.conn.close()
+
+    def __getstate__(self):
+        # Connections can't be pickled, every process opens its own
+        return {'address': self.address}
+
+    def __setstate__(self, state):
+        self.__init__(state['address'])
@@ -0,0 +1,194 @@
+import csv
+from multiprocessing.shared_memory import SharedMemory
+import numpy as np
+from agents import CitizenAgent, ArsonistAgent, FirefighterAgent, PolicemanAgent, AmbulanceAgent
+from state_buffer import LAYERS
+
+METRICS = np.dtype([
+    ('step', np.int64),
+    ('active_fires', np.int32),
+    ('burned_area', np.int32), # Cells that have been on fire at some point
+    ('injured', np.int32), # Agents with injury points, wherever they are (on the map, in an ambulance, in a hospital)
+    ('firefighters_busy', np.int32),
+    ('policemen_busy', np.int32),
+    ('ambulances_busy', np.int32),
+    ('arrest_latency', np.float32), # Steps from the first arsonist report since the previous arrest to an arrest this step, NaN if none
+    ('fires_extinguished', np.int32), # So far
+    ('patients_treated', np.int32), # Discharged from a hospital so far
+    ('time_to_treatment', np.float32), # Mean steps from injury to a hospital bed so far, NaN if none
+])
+
+class MetricsCollector:
+    """
+    Per-step aggregates of a DisasterModel, buffered in a fixed-size chunk that is handed to a sink when full,
+    so memory stays constant however long the run. Call collect(model) after every step, or pass the
+    collector as DisasterModel(metrics=...).
+    """
+
+    def __init__(self, sink, chunk_size=1024):
+        self.sink = sink
+        self.chunk = np.zeros(chunk_size, dtype=METRICS)
+        self.count = 0
+        self.layers = None
+        self.burned = None
+        self.first_report = None # Step of the first arsonist report not followed by an arrest yet
+
+    def _state_layers(self, model):
+        if model.state_buffer is not None:
+            return model.state_buffer.layers
+        if self.layers is None:
+            shape = (model.grid.width, model.grid.height)
+            self.layers = {key: np.zeros(shape, dtype=dtype) for key, dtype in LAYERS.items()}
+        model.fill_state_layers(**self.layers)
+        return self.layers
+
+    def collect(self, model):
+        layers = self._state_layers(model)
+        if self.burned is None:
+            self.burned = np.zeros(layers['fire'].shape, dtype=bool)
+        self.burned |= layers['fire'].astype(bool)
+
+        if self.first_report is None and model.commander.known_arsonist_positions:
+            self.first_report = model.steps
+        arrests = [agent for agent in model.agents_by_type.get(ArsonistAgent, ()) if agent.arrested_at == model.steps]
+        arrest_latency = np.nan
+        if arrests and self.first_report is not None:
+            arrest_latency = model.steps - self.first_report
+            self.first_report = None
+
+        by_type = model.agents_by_type
+        row = self.chunk[self.count]
+        row['step'] = model.steps
+        row['active_fires'] = layers['fire'].sum()
+        row['burned_area'] = self.burned.sum()
+        # Counted per agent, the injured layer only flags cells
+        row['injured'] = sum(agent.injury_points > 0 for agent_type in (CitizenAgent, FirefighterAgent) for agent in by_type.get(agent_type, ()))
+        row['firefighters_busy'] = sum(agent.goal is not None for agent in by_type.get(FirefighterAgent, ()))
+        row['policemen_busy'] = sum(agent.target_arsonist is not None for agent in by_type.get(PolicemanAgent, ()))
+        row['ambulances_busy'] = sum(agent.target_patient is not None or agent.patient is not None for agent in by_type.get(AmbulanceAgent, ()))
+        row['arrest_latency'] = arrest_latency
+        row['fires_extinguished'] = model.fires_extinguished
+        admitted = sum(hospital.admitted for hospital in model.hospitals)
+        row['patients_treated'] = sum(hospital.treated for hospital in model.hospitals)
+        row['time_to_treatment'] = sum(hospital.total_time_to_treatment for hospital in model.hospitals) / admitted if admitted else np.nan
+        self.count += 1
+
+        if self.count == len(self.chunk):
+            self.flush()
+
+    def flush(self):
+        if self.count:
+            self.sink.write(self.chunk[:self.count])
+            self.count = 0
+
+    def close(self):
+        self.flush()
+        self.sink.close()
+
+class CSVSink:
+    def __init__(self, path):
+        self.file = open(path, 'w', newline='')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(METRICS.names)
+
+    def write(self, rows):
+        self.writer.writerows(rows.tolist())
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+class ParquetSink:
+    """Writes every chunk as a row group, needs pyarrow"""
+
+    def __init__(self, path):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError('ParquetSink needs pyarrow, install it or use CSVSink') from e
+        self.pa = pa
+        self.writer = pq.ParquetWriter(path, pa.schema([(name, pa.from_numpy_dtype(METRICS[name])) for name in METRICS.names]))
+
+    def write(self, rows):
+        self.writer.write_table(self.pa.table({name: rows[name] for name in METRICS.names}))
+
+    def close(self):
+        self.writer.close()
+
+class RingBufferSink:
+    """Keeps only the last `capacity` rows in memory, e.g. for live plots"""
+
+    def __init__(self, capacity=10000):
+        self.rows = np.zeros(capacity, dtype=METRICS)
+        self.total = 0
+
+    def write(self, rows):
+        capacity = len(self.rows)
+        # Rows that don't fit are dropped, but they still count
+        total = self.total + len(rows)
+        rows = rows[-capacity:]
+        index = (total - len(rows) + np.arange(len(rows))) % capacity
+        self.rows[index] = rows
+        self.total = total
+
+    def latest(self):
+        # Oldest first
+        capacity = len(self.rows)
+        if self.total <= capacity:
+            return self.rows[:self.total].copy()
+        start = self.total % capacity
+        return np.concatenate([self.rows[start:], self.rows[:start]])
+
+    def rows_since(self, total):
+        """(total, rows) with the rows written after the first `total` ones that are still kept, oldest first"""
+        capacity = len(self.rows)
+        end = self.total
+        start = max(total, end - capacity)
+        rows = self.rows[np.arange(start, end) % capacity]
+        # A writer in another process may have overwritten the oldest ones while they were copied
+        overwritten = self.total - capacity - start
+        return end, rows[max(overwritten, 0):]
+
+    def close(self):
+        pass
+
+class SharedRingBufferSink(RingBufferSink):
+    """
+    RingBufferSink in a shared memory block, so other processes (e.g. the dashboard) can follow the metrics
+    of a running model. The header holds the number of rows written, updated after the rows themselves,
+    and the capacity, so readers only need the block name.
+    """
+
+    HEADER = 2 # total, capacity
+
+    def __init__(self, capacity=10000, name=None):
+        if name is None:
+            self.shm = SharedMemory(create=True, size=self.HEADER * 8 + capacity * METRICS.itemsize)
+            self.owner = True
+        else:
+            self.shm = SharedMemory(name=name, track=False)
+            self.owner = False
+        self.header = np.ndarray((self.HEADER,), dtype=np.int64, buffer=self.shm.buf)
+        if self.owner:
+            self.header[:] = (0, capacity)
+        self.rows = np.ndarray((int(self.header[1]),), dtype=METRICS, buffer=self.shm.buf, offset=self.header.nbytes)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @property
+    def total(self):
+        return int(self.header[0])
+
+    @total.setter
+    def total(self, value):
+        self.header[0] = value
+
+    def close(self):
+        # Drop the views before closing, otherwise the buffer is still exported
+        self.header = self.rows = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
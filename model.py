@@ -1,24 +1,61 @@
+import random
+import numpy as np
 from mesa import Model
+from mesa.agent import AgentSet
 from mesa.space import MultiGrid
-from stable_baselines3 import PPO
-from agents import TreeAgent, PrisonAgent, PolicestationAgent, FirestationAgent, HospitalAgent, CitizenAgent, ArsonistAgent, FirefighterAgent, PolicemanAgent, AmbulanceAgent, CommanderAgent
+from agents import TreeAgent, PrisonAgent, PolicestationAgent, FirestationAgent, HospitalAgent, ShelterAgent, CitizenAgent, ArsonistAgent, FirefighterAgent, PolicemanAgent, AmbulanceAgent, CommanderAgent, HOSPITAL_CAPACITY, MOBILE, occupancy_code
+from citizens import CitizenStage, dilate
+from evacuation import DistanceField
+from roads import RoadNetwork
+from state_buffer import StateBuffer
+from nn.numpy_policy import load_policy
+
+# Independent random streams: where agents are placed, how citizens walk, how firefighters vote and
+# in which order the active agents step
+RNG_STREAMS = ('placement', 'movement', 'voting', 'scheduling')
 
 class DisasterModel(Model):
-    def __init__(self, width, height, num_trees=20, num_prison=1, num_policestations=1, num_firestations=1, num_hospitals=1, num_citizens=10, num_arsonists=1, num_firefighters=3, num_policemen=4, num_ambulances=3):
-        super().__init__()
+    def __init__(self, width, height, num_trees=20, num_prison=1, num_policestations=1, num_firestations=1, num_hospitals=1, hospital_capacity=HOSPITAL_CAPACITY, num_shelters=0, evacuation_radius=3, num_citizens=10, num_arsonists=1, num_firefighters=3, num_policemen=4, num_ambulances=3, road_spacing=None, road_speed=2, vectorized_citizens=False, publish_state=False, policy=None, recorder=None, seed=None, metrics=None, planner=None):
+        # Every random stream of the model is spawned from one SeedSequence, so a run depends on its seed
+        # only and not on what other subsystems or other models in the same process drew before
+        self.seed_sequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+        model_seed, *streams = self.seed_sequence.spawn(1 + len(RNG_STREAMS))
+        super().__init__(seed=int(model_seed.generate_state(1, np.uint64)[0]))
+        self.rngs = {name: random.Random(int(stream.generate_state(1, np.uint64)[0])) for name, stream in zip(RNG_STREAMS, streams)}
         self.grid = MultiGrid(width, height, torus=False)
         self.global_map = {}
         self.firefighter_presence = {} # key: fire_position, value: set of firefighter IDs
         self.num_firefighters = num_firefighters
+        self.fires_extinguished = 0
+        self.burning = set() # Positions of the burning trees, kept up to date by TreeAgent.on_fire
+        self.prev_positions = np.full((0, 2), -1, dtype=np.int32) # See snapshot_positions
+        # Only agents with pending work are stepped, they (de)register themselves as their state changes
+        self.active_agents = AgentSet([], random=self.rngs['scheduling'])
+
+        # Load model, unless a shared one (e.g. inference_server.RemotePolicy) is given
+        self.ppo_arsonist = policy if policy is not None else load_policy('nn/ppo_arsonist')
+
+        # Optional rollouts.RolloutRecorder storing what the arsonists saw and did
+        self.recorder = recorder
+
+        # Optional metrics.MetricsCollector, fed after every step
+        self.metrics = metrics
+
+        # Optional planning.DispatchPlanner the commander asks which fire a crew goes to
+        self.planner = planner
 
-        # Load model
-        self.ppo_arsonist = PPO.load('nn/ppo_arsonist')
+        # Optional roads.RoadNetwork the responders drive on, streets every road_spacing cells
+        self.roads = RoadNetwork.grid(width, height, road_spacing, road_speed) if road_spacing else None
+
+        # Optional citizens.CitizenStage stepping all citizens at once, for maps with very many of them
+        self.citizen_stage = CitizenStage(self) if vectorized_citizens else None
 
         # Create agents
         prison_positions = []
         firestation_positions = []
         policestation_positions = []
         hospital_positions = []
+        self.hospitals = []
 
         for _ in range(num_trees):
             agent = TreeAgent(self)
@@ -40,43 +77,69 @@ class DisasterModel(Model):
             firestation_positions.append(position)
 
         for _ in range(num_hospitals):
-            agent = HospitalAgent(self)
+            agent = HospitalAgent(self, hospital_capacity)
             position = self.place_agent_without_colliding(agent)
             hospital_positions.append(position)
+            self.hospitals.append(agent)
+
+        # With shelters, citizens within evacuation_radius of a fire head to the nearest one
+        shelter_positions = [self.place_agent_without_colliding(ShelterAgent(self)) for _ in range(num_shelters)]
+        self.evacuation = DistanceField(width, height, shelter_positions) if shelter_positions else None
+        self.evacuation_radius = evacuation_radius
+        self.danger = None # Cells within evacuation_radius of a fire, updated every step
+
+        if self.roads is not None:
+            self.roads.precompute(firestation_positions + policestation_positions + hospital_positions + prison_positions)
 
         for _ in range(num_citizens):
-            agent = CitizenAgent(self)
-            self.place_agent(agent)
+            self.add_citizen(CitizenAgent(self))
 
         for _ in range(num_arsonists):
             prison_position = prison_positions[0] if len(prison_positions) > 0 else None
             agent = ArsonistAgent(self, self.ppo_arsonist, prison_position)
             self.place_agent(agent)
+            self.activate(agent)
 
-        for _ in range(num_firefighters):
-            position = firestation_positions[0] if len(firestation_positions) > 0 else None
+        # Crews are spread over the stations, key None when there is no station
+        self.crews = {FirefighterAgent: {}, PolicemanAgent: {}}
+        for i in range(num_firefighters):
+            position = firestation_positions[i % len(firestation_positions)] if len(firestation_positions) > 0 else None
             agent = FirefighterAgent(self, position)
             self.place_agent(agent, position)
+            self.activate(agent)
+            self.crews[FirefighterAgent].setdefault(position, []).append(agent)
 
-        for _ in range(num_policemen):
+        for i in range(num_policemen):
             prison_position = prison_positions[0] if len(prison_positions) > 0 else None
-            policestation_position = policestation_positions[0] if len(policestation_positions) > 0 else None
+            policestation_position = policestation_positions[i % len(policestation_positions)] if len(policestation_positions) > 0 else None
             agent = PolicemanAgent(self, policestation_position, prison_position)
             self.place_agent(agent, policestation_position)
+            self.activate(agent)
+            self.crews[PolicemanAgent].setdefault(policestation_position, []).append(agent)
 
-        for _ in range(num_ambulances):
-            hospital_position = hospital_positions[0] if len(hospital_positions) > 0 else None
+        # Every cell is the responsibility of the staffed station that reaches it first
+        self.zones = {agent_type: self.response_zones(list(crews)) for agent_type, crews in self.crews.items()}
+
+        for i in range(num_ambulances):
+            hospital_position = hospital_positions[i % len(hospital_positions)] if len(hospital_positions) > 0 else None
             agent = AmbulanceAgent(self, hospital_position)
             self.place_agent(agent, hospital_position)
+            self.activate(agent)
 
         commander = CommanderAgent(self)
         self.place_agent(commander)
         self.commander = commander
+
+        # Optionally publish the state layers in shared memory for renderers and workers in other processes
+        self.state_buffer = None
+        if publish_state:
+            self.state_buffer = StateBuffer(width, height)
+            self.state_buffer.publish(self)
     
     def place_agent(self, agent, position=None):
         if position is None:
-            x = self.random.randrange(self.grid.width)
-            y = self.random.randrange(self.grid.height)
+            x = self.rngs['placement'].randrange(self.grid.width)
+            y = self.rngs['placement'].randrange(self.grid.height)
         else:
             x, y = position
         self.grid.place_agent(agent, (x, y))
@@ -84,31 +147,157 @@ class DisasterModel(Model):
         return (x, y)
 
     def place_agent_without_colliding(self, agent):
-        x = self.random.randrange(self.grid.width)
-        y = self.random.randrange(self.grid.height)
+        rng = self.rngs['placement']
+        x = rng.randrange(self.grid.width)
+        y = rng.randrange(self.grid.height)
         while self.grid.get_cell_list_contents((x, y)):
             # Avoid placing agent on an already occupied cell
-            x = self.random.randrange(self.grid.width)
-            y = self.random.randrange(self.grid.height)
+            x = rng.randrange(self.grid.width)
+            y = rng.randrange(self.grid.height)
         self.grid.place_agent(agent, (x, y))
         self.agents.add(agent)
         return (x, y)
 
+    def add_citizen(self, agent, position=None):
+        position = self.place_agent(agent, position)
+        if self.citizen_stage is not None:
+            self.citizen_stage.add(agent)
+        else:
+            self.activate(agent)
+        return position
+
+    def remove_citizen(self, agent):
+        if self.citizen_stage is not None:
+            self.citizen_stage.remove(agent)
+        self.deactivate(agent)
+        self.grid.remove_agent(agent)
+        agent.remove()
+
+    def activate(self, agent):
+        if self.citizen_stage is not None and agent in self.citizen_stage:
+            self.citizen_stage.resume(agent)
+        else:
+            self.active_agents.add(agent)
+
+    def deactivate(self, agent):
+        if self.citizen_stage is not None and agent in self.citizen_stage:
+            self.citizen_stage.suspend(agent)
+        else:
+            self.active_agents.discard(agent)
+
+    def wake(self, agent_type, pos=None):
+        # Reactivate every agent of a type, or only the crew responsible for pos, e.g. when a new incident is reported
+        if pos is not None and agent_type in self.crews:
+            agents = self.crews[agent_type].get(self.station_of(agent_type, pos), ())
+        else:
+            agents = self.agents_by_type.get(agent_type, ())
+        for agent in agents:
+            self.active_agents.add(agent)
+
+    def response_zones(self, stations):
+        # (width, height) map of the index of the station with the shortest travel time, None without stations
+        if not stations or None in stations:
+            return None
+        if self.roads is not None:
+            times = np.stack([self.roads.times_from(station) for station in stations])
+        else:
+            xs, ys = np.indices((self.grid.width, self.grid.height))
+            times = np.stack([np.maximum(abs(xs - x), abs(ys - y)) for x, y in stations])
+        return np.asarray(stations)[times.argmin(axis=0)]
+
+    def station_of(self, agent_type, pos):
+        zones = self.zones[agent_type]
+        if zones is None:
+            return None
+        x, y = zones[pos]
+        return (int(x), int(y))
+
+    def fire_changed(self, tree):
+        if tree.on_fire:
+            self.burning.add(tree.pos)
+        else:
+            self.burning.discard(tree.pos)
+        # Fires block the evacuation routes
+        if self.evacuation is not None:
+            if tree.on_fire:
+                self.evacuation.block(tree.pos)
+            else:
+                self.evacuation.unblock(tree.pos)
+
+    def snapshot_positions(self):
+        # Positions of the mobile agents by unique_id, taken by renderers before a step to interpolate the moves
+        agents = [agent for agent_type in MOBILE for agent in self.agents_by_type.get(agent_type, ())]
+        ids = np.fromiter((agent.unique_id for agent in agents), dtype=np.int64, count=len(agents))
+        size = int(ids.max()) + 1 if len(ids) else 0
+        if len(self.prev_positions) < size:
+            self.prev_positions = np.full((size, 2), -1, dtype=np.int32)
+        self.prev_positions[:] = -1
+        self.prev_positions[ids] = [agent.pos if agent.pos is not None else (-1, -1) for agent in agents]
+
+    def previous_position(self, agent):
+        if agent.unique_id >= len(self.prev_positions):
+            return None
+        x, y = self.prev_positions[agent.unique_id].tolist()
+        return None if x < 0 else (x, y)
+
+    def in_danger(self, pos):
+        return self.danger is not None and self.danger[pos]
+
     def step(self):
-        self.agents.shuffle_do('step')
+        if self.evacuation is not None:
+            fires = np.zeros((self.grid.width, self.grid.height), dtype=bool)
+            for pos in self.burning:
+                fires[pos] = True
+            self.danger = dilate(fires, self.evacuation_radius)
+
+        if self.citizen_stage is not None:
+            self.citizen_stage.step()
+        self.active_agents.shuffle_do('step')
 
         # After all agents have stepped, the commander tallies the result
+        # Each station's crew works on the fire its votes picked, crews work different fires in parallel
         fire_list = self.commander.get_fires()
         if fire_list:
-            winning_fire = self.commander.tally_votes()
-            if winning_fire:
-                for agent in self.agents:
-                    if isinstance(agent, FirefighterAgent): # and agent.goal is None
+            for station, crew in self.crews[FirefighterAgent].items():
+                winning_fire = self.commander.dispatch(crew, station)
+                if winning_fire:
+                    for agent in crew: # and agent.goal is None
                         agent.goal = winning_fire
-                    agent._vote = None # Clear vote for next round
+                        agent._vote = None # Clear vote for next round
+
+        if self.state_buffer is not None:
+            self.state_buffer.publish(self)
+
+        if self.metrics is not None:
+            self.metrics.collect(self)
+
+    def travel_time(self, a, b):
+        # Steps between two cells for the responders
+        if self.roads is not None:
+            return self.roads.travel_time(a, b)
+        return max(abs(a[0] - b[0]), abs(a[1] - b[1]))
+
+    def fill_state_layers(self, occupancy, fire, injured):
+        # Single pass over the grid writing into (width, height) arrays
+        fire[:] = 0
+        injured[:] = 0
+        for cell, (x, y) in self.grid.coord_iter():
+            occupancy[x, y] = occupancy_code(cell)
+            for agent in cell:
+                if isinstance(agent, TreeAgent) and agent.on_fire:
+                    fire[x, y] = 1
+                elif getattr(agent, 'injury_points', 0) > 0:
+                    injured[x, y] = 1
+
+    def close(self):
+        if self.metrics is not None:
+            self.metrics.close()
+        if self.state_buffer is not None:
+            self.state_buffer.close()
+            self.state_buffer = None
 
     def collect_firefighter_votes(self, fire_list):
         votes = []
         for _ in range(self.num_firefighters):
-            votes.append(self.random.choice(fire_list))
+            votes.append(self.rngs['voting'].choice(fire_list))
         return votes
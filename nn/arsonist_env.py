@@ -0,0 +1,392 @@
+import gymnasium as gym
+from gymnasium import spaces
+import numpy as np
+
+GRID_SIZE = 50
+LOCAL_OBS_SIZE = 10
+
+def generate_grid(rng, grid_size, num_cops, num_firefighters, num_citizens, exclude=None):
+    '''
+    Generate a realistic environment with trees, cops, firefighters, and citizens.
+    Every cell is drawn at once from a permutation of the free cells.
+    '''
+    grid = np.zeros((grid_size, grid_size), dtype=np.int8)
+    cells = rng.permutation(grid_size * grid_size)
+    if exclude is not None:
+        cells = cells[cells != exclude[0] * grid_size + exclude[1]]
+
+    # Trees cover 25% of the grid, NPC counts are drawn from their (min, max) ranges
+    counts = [
+        (1, int(grid_size * grid_size * 0.25)),
+        (3, rng.integers(num_cops[0], num_cops[1] + 1)),
+        (5, rng.integers(num_firefighters[0], num_firefighters[1] + 1)),
+        (4, rng.integers(num_citizens[0], num_citizens[1] + 1)),
+    ]
+    start = 0
+    for value, count in counts:
+        grid.flat[cells[start:start + count]] = value
+        start += count
+    return grid
+
+def generate_map_pool(path, num_maps, grid_size=GRID_SIZE, num_cops=(2, 4), num_firefighters=(1, 3), num_citizens=(5, 10), seed=0):
+    '''Write `num_maps` grids to a .npy file that ArsonistEnv(map_pool=path) memory-maps'''
+    rng = np.random.default_rng(seed)
+    pool = np.lib.format.open_memmap(path, mode='w+', dtype=np.int8, shape=(num_maps, grid_size, grid_size))
+    for i in range(num_maps):
+        pool[i] = generate_grid(rng, grid_size, num_cops, num_firefighters, num_citizens)
+    pool.flush()
+    return path
+
+class ArsonistEnv(gym.Env):
+    def __init__(self, grid_size=GRID_SIZE, num_cops=(2, 4), num_firefighters=(1, 3), num_citizens=(5, 10), map_pool=None):
+        super().__init__()
+        self.current_step = 0
+        self.max_steps = 200
+
+        # Map size and (min, max) number of NPCs, can be changed between episodes by a curriculum
+        self.grid_size = grid_size
+        self.num_cops = num_cops
+        self.num_firefighters = num_firefighters
+        self.num_citizens = num_citizens
+        self.pending_difficulty = {}
+
+        # Optional pool of pre-generated maps (see generate_map_pool), it sets the grid size and NPC counts
+        self.map_pool = np.load(map_pool, mmap_mode='r') if map_pool is not None else None
+        
+        # Grid values: 0=empty, 1=tree, 2=burning_tree, 3=cop, 4=citizen, 5=firefighter
+        self.grid = np.zeros((grid_size, grid_size), dtype=np.int8)
+        
+        # Action space: [0] do nothing, [1-4] move (up/down/left/right), [5] ignite
+        self.action_space = spaces.Discrete(6)
+        
+        # Observation: 10x10 partial grid centered around agent, flattened
+        self.observation_space = spaces.Box(low=0, high=255, shape=(LOCAL_OBS_SIZE * LOCAL_OBS_SIZE,), dtype=np.uint8)
+        
+        self.agent_pos = (grid_size // 2, grid_size // 2)
+        self.cop_positions = np.zeros((0, 2), dtype=np.int64) # N x 2 arrays, moved in place
+        self.firefighter_positions = np.zeros((0, 2), dtype=np.int64)
+        self.citizen_positions = []
+        self.tree_positions = []
+        self.burning_trees = set()
+        
+        # Tracking for rewards
+        self.trees_burned = 0
+        self.times_caught = 0
+        self.distance_from_cops = 0
+        
+    def reset(self, *, seed=None, options=None):
+        super().reset(seed=seed)
+        self.current_step = 0
+        self.trees_burned = 0
+        self.times_caught = 0
+
+        # The grid can only change size between episodes
+        for key, value in self.pending_difficulty.items():
+            if value is not None:
+                setattr(self, key, value)
+        self.pending_difficulty = {}
+        
+        if self.map_pool is not None:
+            # Pre-generated map, the arsonist starts on a random free cell away from the border
+            self.grid = np.array(self.map_pool[self.np_random.integers(len(self.map_pool))])
+            self.grid_size = self.grid.shape[0]
+            free = np.argwhere(self.grid[5:self.grid_size-5, 5:self.grid_size-5] == 0) + 5
+            self.agent_pos = tuple(int(v) for v in free[self.np_random.integers(len(free))])
+        else:
+            # Place agent randomly
+            self.agent_pos = tuple(int(v) for v in self.np_random.integers(5, self.grid_size-5, size=2))
+            
+            # Generate environment
+            self.grid = generate_grid(self.np_random, self.grid_size, self.num_cops, self.num_firefighters, self.num_citizens, exclude=self.agent_pos)
+
+        self._read_positions()
+
+        # Fire spread draws from its own stream, derived from the episode's map stream after the map is drawn
+        self.fire_rng = np.random.default_rng(self.np_random.integers(2**63))
+        
+        obs = self._get_observation()
+        info = {}
+        return obs, info
+    
+    def _read_positions(self):
+        '''Positions of trees, cops, firefighters and citizens from a freshly generated grid'''
+        self.tree_positions = np.argwhere(self.grid == 1)
+        self.cop_positions = np.argwhere(self.grid == 3)
+        self.firefighter_positions = np.argwhere(self.grid == 5)
+        self.citizen_positions = np.argwhere(self.grid == 4)
+        self.burning_trees = set()
+    
+    def set_difficulty(self, grid_size=None, num_cops=None, num_firefighters=None):
+        '''Applied from the next reset, called by the training curriculum through VecEnv.env_method'''
+        self.pending_difficulty = {'grid_size': grid_size, 'num_cops': num_cops, 'num_firefighters': num_firefighters}
+
+    def step(self, action):
+        old_pos = self.agent_pos
+        reward = 0
+        
+        # Execute action
+        reward += self._execute_action(action)
+        
+        # Move other agents
+        self._move_other_agents()
+        
+        # Update burning trees (spread fire)
+        self._update_fire()
+        
+        # Check if caught by cop
+        if self._check_caught():
+            reward -= 100  # Large penalty for being caught
+            self.times_caught += 1
+        
+        # Calculate distance-based reward (stay away from cops)
+        reward += self._calculate_distance_reward()
+        
+        # Reward shaping to encourage better behavior
+        if action == 0:
+            reward -= 2  # Penalty for doing nothing
+        elif 1 <= action <= 4:  # Movement actions
+            # Reward for moving towards trees
+            reward += self._calculate_tree_proximity_reward()
+        
+        # Small penalty for each step to encourage efficiency
+        reward -= 0.1
+        
+        self.current_step += 1
+        
+        observation = self._get_observation()
+        terminated = self._check_done()
+        truncated = False
+        info = {
+            'trees_burned': self.trees_burned,
+            'times_caught': self.times_caught,
+            'step': self.current_step
+        }
+        
+        return observation, reward, terminated, truncated, info
+    
+    def _execute_action(self, action):
+        '''Execute the agent's action and return immediate reward'''
+        reward = 0
+        x, y = self.agent_pos
+        
+        if action == 1:  # UP
+            new_x = x - 1
+            new_y = y
+        elif action == 2:  # DOWN
+            new_x = x + 1
+            new_y = y
+        elif action == 3:  # LEFT
+            new_x = x
+            new_y = y - 1
+        elif action == 4:  # RIGHT
+            new_x = x
+            new_y = y + 1
+        elif action == 5:  # IGNITE
+            # Check if there are any trees to ignite first
+            if not self._has_adjacent_trees(x, y):
+                reward -= 10  
+                return reward
+            
+            # Try to ignite current cell or adjacent cells
+            ignited = False
+            
+            # Check current cell first
+            if self.grid[x, y] == 1:  # Tree in current cell
+                self.grid[x, y] = 2  # Burning tree
+                self.burning_trees.add((x, y))
+                self.trees_burned += 1
+                reward += 50  # Reward for burning a tree
+                ignited = True
+            else:
+                # Check adjacent cells
+                for dx in [-1, 0, 1]:
+                    for dy in [-1, 0, 1]:
+                        if dx == 0 and dy == 0:  # Skip current cell (already checked)
+                            continue
+                        check_x, check_y = x + dx, y + dy
+                        if (0 <= check_x < self.grid_size and 0 <= check_y < self.grid_size and 
+                            self.grid[check_x, check_y] == 1):  # Tree
+                            self.grid[check_x, check_y] = 2  # Burning tree
+                            self.burning_trees.add((check_x, check_y))
+                            self.trees_burned += 1
+                            reward += 50  # Reward for burning a tree
+                            ignited = True
+                            break
+                    if ignited:
+                        break
+            
+            return reward
+        else:  # action == 0, do nothing
+            return reward
+        
+        # For movement actions, check bounds first (reject out-of-bounds moves)
+        if new_x < 0 or new_x >= self.grid_size or new_y < 0 or new_y >= self.grid_size:
+            reward -= 5  # Penalty for trying to move out of bounds
+            return reward  # Stay in current position
+        
+        # Check if new position is valid (not occupied)
+        if self.grid[new_x, new_y] == 0:  # Empty space
+            self.agent_pos = (new_x, new_y)
+            reward += 0.5  # Small reward for moving
+        else:
+            reward -= 2  # Penalty for trying to move into occupied space
+        
+        return reward
+    
+    def _move_other_agents(self):
+        '''Simple AI for other agents'''
+        
+        # Move cops towards arsonist
+        if len(self.cop_positions):
+            self._move_towards_targets(self.cop_positions, np.array(self.agent_pos), 3)
+        
+        # Move firefighters towards the closest fire
+        if len(self.firefighter_positions) and self.burning_trees:
+            fires = np.array(list(self.burning_trees))
+            distances = np.abs(self.firefighter_positions[:, None, :] - fires[None, :, :]).sum(axis=2)
+            self._move_towards_targets(self.firefighter_positions, fires[distances.argmin(axis=1)], 5)
+
+    def _move_towards_targets(self, positions, targets, code):
+        '''
+        Move each agent (rows of `positions`, updated in place) one cell towards its target if the cell is empty.
+        Gives the same result as moving them one by one in order: a cell freed by an agent can only be
+        taken by the agents after it, and the first of several agents heading to a cell gets it.
+        '''
+        new_positions = positions + np.sign(targets - positions)
+        inside = ((new_positions >= 0) & (new_positions < self.grid_size)).all(axis=1)
+        candidates = np.flatnonzero(inside)
+        vacated_by = np.full(self.grid.shape, -1)
+
+        while candidates.size:
+            new_x, new_y = new_positions[candidates, 0], new_positions[candidates, 1]
+            free = (self.grid[new_x, new_y] == 0) & (vacated_by[new_x, new_y] < candidates)
+            movers = candidates[free]
+            if not movers.size:
+                break
+            _, first = np.unique(new_x[free] * self.grid_size + new_y[free], return_index=True)
+            movers = movers[first]
+
+            old_x, old_y = positions[movers, 0], positions[movers, 1]
+            self.grid[old_x, old_y] = 0
+            vacated_by[old_x, old_y] = movers
+            positions[movers] = new_positions[movers]
+            self.grid[positions[movers, 0], positions[movers, 1]] = code
+
+            # Agents blocked by a cell freed in this round get another chance
+            candidates = np.setdiff1d(candidates, movers)
+    
+    def _update_fire(self):
+        '''Update fire spread and extinguishing'''
+        new_fires = set()
+        
+        for fire_pos in self.burning_trees.copy():
+            x, y = fire_pos
+            
+            # Check if firefighters are adjacent to extinguish
+            if len(self.firefighter_positions) and (np.abs(self.firefighter_positions - fire_pos).max(axis=1) <= 1).any():
+                # Extinguish fire
+                self.grid[x, y] = 0  # Empty space (burnt)
+                continue
+            
+            # Fire spreads to adjacent trees with some probability
+            for dx in [-1, 0, 1]:
+                for dy in [-1, 0, 1]:
+                    if dx == 0 and dy == 0:
+                        continue
+                    
+                    new_x, new_y = x + dx, y + dy
+                    if (0 <= new_x < self.grid_size and 0 <= new_y < self.grid_size and 
+                        self.grid[new_x, new_y] == 1 and self.fire_rng.random() < 0.1):
+                        self.grid[new_x, new_y] = 2
+                        new_fires.add((new_x, new_y))
+            
+            new_fires.add(fire_pos)
+        
+        self.burning_trees = new_fires
+    
+    def _check_caught(self):
+        '''Check if arsonist is caught by a cop'''
+        if not len(self.cop_positions):
+            return False
+        return bool((np.abs(self.cop_positions - self.agent_pos).max(axis=1) <= 1).any())
+    
+    def _has_adjacent_trees(self, x, y):
+        '''Check if there are any trees adjacent to the given position'''
+        for dx in [-1, 0, 1]:
+            for dy in [-1, 0, 1]:
+                check_x, check_y = x + dx, y + dy
+                if (0 <= check_x < self.grid_size and 0 <= check_y < self.grid_size and 
+                    self.grid[check_x, check_y] == 1):
+                    return True
+        return False
+    
+    def _calculate_tree_proximity_reward(self):
+        '''Reward for being close to unburned trees'''
+        agent_x, agent_y = self.agent_pos
+        closest_tree_dist = float('inf')
+        
+        # Find closest unburned tree
+        for x in range(self.grid_size):
+            for y in range(self.grid_size):
+                if self.grid[x, y] == 1:  # Unburned tree
+                    dist = abs(x - agent_x) + abs(y - agent_y)
+                    closest_tree_dist = min(closest_tree_dist, dist)
+        
+        if closest_tree_dist == float('inf'):
+            return 0  # No trees left
+        elif closest_tree_dist <= 1:
+            return 5  # Very close to tree
+        elif closest_tree_dist <= 3:
+            return 2  # Moderately close
+        else:
+            return 0
+    
+    def _calculate_distance_reward(self):
+        '''Reward for staying away from cops'''
+        if not len(self.cop_positions):
+            return 0
+        
+        min_distance = np.abs(self.cop_positions - self.agent_pos).sum(axis=1).min()
+        
+        # Reward for being far from cops, penalty for being close
+        if min_distance <= 2:
+            return -10
+        elif min_distance <= 5:
+            return -2
+        else:
+            return 1
+    
+    def _get_observation(self):
+        '''Returns a flattened 10x10 partial view centered on the agent.'''
+        x, y = self.agent_pos
+        half = LOCAL_OBS_SIZE // 2
+        
+        # Create padded grid
+        padded = np.pad(self.grid, ((half, half), (half, half)), mode='constant', constant_values=0)
+        
+        # Extract local view
+        local_view = padded[x:x + LOCAL_OBS_SIZE, y:y + LOCAL_OBS_SIZE]
+        
+        return local_view.flatten().astype(np.uint8)
+    
+    def _check_done(self):
+        '''Check if episode should end'''
+        return (self.current_step >= self.max_steps or 
+                self.times_caught > 2 or 
+                self.trees_burned >= 20)
+    
+    def render(self, mode='human'):
+        '''Render the environment'''
+        if mode == 'human':
+            display_grid = self.grid.copy()
+            x, y = self.agent_pos
+            display_grid[x, y] = 9  # Mark agent
+            print(f'Step {self.current_step}, Trees burned: {self.trees_burned}, Times caught: {self.times_caught}')
+            print(f'Agent at: {self.agent_pos}')
+            # Only print a small section around the agent for clarity
+            start_x = max(0, x - 5)
+            end_x = min(self.grid_size, x + 6)
+            start_y = max(0, y - 5)
+            end_y = min(self.grid_size, y + 6)
+            print(display_grid[start_x:end_x, start_y:end_y])
+            print('-' * 30)
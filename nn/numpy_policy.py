@@ -0,0 +1,67 @@
+import os
+import numpy as np
+
+ACTIVATIONS = {
+    'tanh': np.tanh,
+    'relu': lambda x: np.maximum(x, 0),
+}
+
+class NumpyPolicy:
+    '''
+    Actor network of a PPO MlpPolicy exported by ppo.export_policy, evaluated with NumPy only.
+    Exposes the same predict() as the stable_baselines3 model for ArsonistAgent.
+    '''
+
+    def __init__(self, weights, biases, activation='tanh', seed=None):
+        self.weights = [np.asarray(weight, dtype=np.float32) for weight in weights]
+        self.biases = [np.asarray(bias, dtype=np.float32) for bias in biases]
+        self.activation = activation
+        self._activation = ACTIVATIONS[activation]
+        self.rng = np.random.default_rng(seed)
+
+    @classmethod
+    def load(cls, path, seed=None):
+        with np.load(path) as data:
+            num_layers = int(data['num_layers'])
+            weights = [data[f'w{i}'] for i in range(num_layers)]
+            biases = [data[f'b{i}'] for i in range(num_layers)]
+            activation = str(data['activation'])
+        return cls(weights, biases, activation, seed)
+
+    def logits(self, obs):
+        x = np.asarray(obs, dtype=np.float32)
+        last = len(self.weights) - 1
+        for i, (weight, bias) in enumerate(zip(self.weights, self.biases)):
+            # Weights are stored like torch.nn.Linear, (out_features, in_features)
+            x = x @ weight.T + bias
+            if i < last:
+                x = self._activation(x)
+        return x
+
+    def predict(self, obs, deterministic=True):
+        logits = self.logits(obs)
+        if deterministic:
+            return logits.argmax(axis=-1), None
+
+        # Sample from the categorical distribution with the Gumbel-max trick
+        gumbel = -np.log(-np.log(self.rng.uniform(size=logits.shape)))
+        return (logits + gumbel).argmax(axis=-1), None
+
+def load_policy(path='nn/ppo_arsonist'):
+    '''Prefer the exported NumPy weights next to the stable_baselines3 model, torch is only imported as a fallback'''
+    if os.path.exists(path + '.npz'):
+        return NumpyPolicy.load(path + '.npz')
+
+    from stable_baselines3 import PPO
+    return PPO.load(path)
+
+_policy = None
+
+def init_worker(policy_path):
+    '''Process pool initializer, loads the policy once per worker instead of once per task'''
+    global _policy
+    _policy = load_policy(policy_path)
+
+def worker_policy():
+    '''The policy loaded by init_worker in this process'''
+    return _policy
@@ -0,0 +1,276 @@
+import io
+import logging
+import os
+import pickle
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from multiprocessing.shared_memory import SharedMemory
+import numpy as np
+from mesa import Agent
+from mesa.agent import AgentSet
+from agents import TreeAgent, PrisonAgent, PolicestationAgent, FirestationAgent, ShelterAgent, FirefighterAgent
+from nn.numpy_policy import init_worker, worker_policy
+
+logger = logging.getLogger(__name__)
+
+# Agents that never change once placed, trees only catch fire and that is in model.burning
+STATIC_AGENTS = (TreeAgent, PrisonAgent, PolicestationAgent, FirestationAgent, ShelterAgent)
+# Attributes of the model itself that change while it runs
+MODEL_STATE = ('steps', 'running', 'fires_extinguished', 'firefighter_presence', 'global_map', 'danger')
+
+class _ForkPickler(pickle.Pickler):
+    # The policy stays behind, every worker has its own copy, and so do the resources owned by the original
+    def __init__(self, file, model):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.model = model
+        self.excluded = {id(obj) for obj in (model.state_buffer, model.metrics, model.recorder, model.planner) if obj is not None}
+
+    def persistent_id(self, obj):
+        if obj is self.model.ppo_arsonist:
+            return 'policy'
+        if id(obj) in self.excluded:
+            return 'none'
+        return None
+
+class _ForkUnpickler(pickle.Unpickler):
+    def persistent_load(self, pid):
+        return worker_policy() if pid == 'policy' else None
+
+def fork(model):
+    """Snapshot of a DisasterModel as bytes, without its policy, state buffer, metrics, recorder and planner"""
+    buffer = io.BytesIO()
+    _ForkPickler(buffer, model).dump(model)
+    return buffer.getvalue()
+
+def _read(name, size):
+    shm = SharedMemory(name=name, track=False)
+    try:
+        return bytes(shm.buf[:size])
+    finally:
+        shm.close()
+
+class _StatePickler(pickle.Pickler):
+    # Agents and the model are sent as references into the copy of the map the worker already has
+    def __init__(self, file, model):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.model = model
+
+    def persistent_id(self, obj):
+        if isinstance(obj, Agent):
+            return obj.unique_id
+        if obj is self.model:
+            return 'model'
+        if obj is self.model.ppo_arsonist:
+            return 'policy'
+        return None
+
+class _StateUnpickler(pickle.Unpickler):
+    def __init__(self, file, model, agents):
+        super().__init__(file)
+        self.model = model
+        self.agents = agents
+
+    def persistent_load(self, pid):
+        if pid == 'model':
+            return self.model
+        if pid == 'policy':
+            return worker_policy()
+        return self.agents[pid]
+
+def capture(model):
+    """What changes while a DisasterModel runs, as bytes that restore applies to a fork of the same map"""
+    stage = model.citizen_stage
+    state = {
+        'model': {key: getattr(model, key) for key in MODEL_STATE},
+        'burning': model.burning,
+        'agents': [(agent, {key: value for key, value in vars(agent).items() if key != 'model'})
+                   for agent in model.agents if not isinstance(agent, STATIC_AGENTS)],
+        'active': list(model.active_agents),
+        'evacuation': (model.evacuation.blocked, model.evacuation.distance) if model.evacuation is not None else None,
+        'stage': (stage.agents, stage.pos, stage.injury, stage.active) if stage is not None else None,
+    }
+    buffer = io.BytesIO()
+    _StatePickler(buffer, model).dump(state)
+    return buffer.getvalue()
+
+def restore(model, trees, state):
+    # Trees don't move, only their fire changes, without going through fire_changed as the field comes along
+    for pos in model.burning ^ state['burning']:
+        trees[pos]._on_fire = pos in state['burning']
+    model.burning = state['burning']
+    for key, value in state['model'].items():
+        setattr(model, key, value)
+
+    # Every agent that may have moved is placed again in the same order, so the order within the cells
+    # doesn't depend on what the worker rolled out before
+    grid = model.grid
+    for agent, _ in state['agents']:
+        if agent.pos is not None:
+            grid.remove_agent(agent)
+    for agent, values in state['agents']:
+        agent.__dict__.update(values, pos=None)
+        if values['pos'] is not None:
+            grid.place_agent(agent, values['pos'])
+    model.active_agents = AgentSet(state['active'], random=model.rngs['scheduling'])
+
+    if state['evacuation'] is not None:
+        model.evacuation.blocked, model.evacuation.distance = state['evacuation']
+    if state['stage'] is not None:
+        stage = model.citizen_stage
+        stage.agents, stage.pos, stage.injury, stage.active = state['stage']
+        stage.agents = list(stage.agents)
+        stage.rows = {agent: row for row, agent in enumerate(stage.agents)}
+
+_base = (None, None, None) # (shared memory name, model, trees by position) of the map this worker rolls out on
+_state = (None, None) # (shared memory name, bytes) of the decision this worker last rolled out
+
+def load_base(name, size):
+    # Unpickled once per map and worker, every rollout then only restores the state of its decision
+    global _base
+    if _base[0] != name:
+        model = _ForkUnpickler(io.BytesIO(_read(name, size))).load()
+        _base = (name, model, {tree.pos: tree for tree in model.agents_by_type.get(TreeAgent, ())})
+    return _base[1], _base[2]
+
+def load_state(name, size):
+    # Copied out of shared memory once per decision and worker, every rollout unpickles its own copy
+    global _state
+    if _state[0] != name:
+        _state = (name, _read(name, size))
+    return _state[1]
+
+def rollout(base, state, station, fire, horizon, seed, deadline):
+    """
+    Send the crew of station to fire in the worker's copy of the map, reset to the shared state of the
+    decision, and return the burning cells after horizon steps. None if the wall clock passes deadline
+    first or the decision is already over. base and state are (shared memory name, size) pairs.
+    """
+    try:
+        model, trees = load_base(*base)
+        snapshot = load_state(*state)
+    except FileNotFoundError:
+        return None
+    agents = {agent.unique_id: agent for agent in model.agents}
+    restore(model, trees, _StateUnpickler(io.BytesIO(snapshot), model, agents).load())
+    # A different future for every sample
+    for i, rng in enumerate([model.random, *model.rngs.values()]):
+        rng.seed(int(np.random.SeedSequence([seed, i]).generate_state(1)[0]))
+    if model.citizen_stage is not None:
+        model.citizen_stage.rng = np.random.default_rng(seed)
+    for agent in model.crews[FirefighterAgent][station]:
+        agent.goal = fire
+        agent._vote = None
+    for _ in range(horizon):
+        # Late rollouts give their worker back instead of holding up the next decision
+        if time.time() > deadline:
+            return None
+        model.step()
+    return len(model.burning)
+
+class DispatchPlanner:
+    """
+    Picks the fire a crew is sent to by simulating every candidate. The map is forked into shared memory
+    once, and every worker unpickles it once. For each decision only the state that changes (positions,
+    fires, goals and votes, injuries, reports) is shared; each rollout resets the worker's copy to it,
+    rolls forward `horizon` steps, `samples` times per candidate with different seeds, and the candidate
+    with the fewest burning cells on average wins. Rollouts that have not finished within `time_budget`
+    seconds stop, so a decision never holds up a step, or the decisions after it, for much longer than that.
+    """
+
+    def __init__(self, horizon=10, samples=4, time_budget=0.5, workers=None, policy_path='nn/ppo_arsonist', seed=0):
+        self.horizon = horizon
+        self.samples = samples
+        self.time_budget = time_budget
+        self.workers = workers or os.cpu_count()
+        self.executor = ProcessPoolExecutor(self.workers, initializer=init_worker, initargs=(policy_path,))
+        self.seed_sequence = np.random.SeedSequence(seed)
+        self.map_key = None # Which model and agents the shared map is a fork of
+        self.base = None # Fork of the map, shared with the workers
+        self.base_size = 0
+        self.state = None # State of the current decision, shared with the workers
+        self.decisions = 0
+        self.timeouts = 0 # Decisions that ran out of time before every rollout was done
+
+    @staticmethod
+    def _share(data, previous):
+        # Replaces the previous block, rollouts still opening that one give up
+        DispatchPlanner._unlink(previous)
+        shm = SharedMemory(create=True, size=len(data))
+        shm.buf[:len(data)] = data
+        return shm
+
+    @staticmethod
+    def _unlink(shm):
+        if shm is not None:
+            shm.close()
+            shm.unlink()
+
+    def _snapshot(self, model):
+        # The map is forked again only when agents were added or removed, e.g. by sharding migrations
+        map_key = (id(model), len(model.agents), max(agent.unique_id for agent in model.agents))
+        if map_key != self.map_key:
+            base = fork(model)
+            self.base = self._share(base, self.base)
+            self.base_size = len(base)
+            self.map_key = map_key
+        state = capture(model)
+        self.state = self._share(state, self.state)
+        return (self.base.name, self.base_size), (self.state.name, len(state))
+
+    def choose(self, model, station, candidates, preferred=None):
+        """
+        Best fire of candidates for the crew of station, None if no rollout finished in time. Ties go to
+        preferred (the fire the crew voted for), then to the first of the sorted candidates, so the choice
+        doesn't depend on the order the rollouts finish in.
+        """
+        candidates = sorted(candidates)
+        # Wall clock, the workers compare against it too
+        deadline = time.time() + self.time_budget
+        base, state = self._snapshot(model)
+        if time.time() >= deadline:
+            logger.warning('Snapshot of the model took longer than the time budget of %.2f s, no rollouts', self.time_budget)
+            self.decisions += 1
+            self.timeouts += 1
+            return None
+        seeds = self.seed_sequence.spawn(1)[0].generate_state(self.samples).tolist()
+
+        # Sample by sample, so that every candidate has as many rollouts as possible when time runs out
+        tasks = deque((seed, fire) for seed in seeds for fire in candidates)
+        futures = {}
+        outcomes = {}
+        while tasks or futures:
+            # No more rollouts in flight than workers, so nothing is left queued when time runs out
+            while tasks and len(futures) < self.workers:
+                seed, fire = tasks.popleft()
+                future = self.executor.submit(rollout, base, state, station, fire, self.horizon, seed, deadline)
+                futures[future] = fire
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            done, _ = wait(futures, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                fire = futures.pop(future)
+                burning = future.result()
+                if burning is not None:
+                    outcomes.setdefault(fire, []).append(burning)
+
+        self.decisions += 1
+        if tasks or futures:
+            self.timeouts += 1
+        if not outcomes:
+            return None
+        scored = [fire for fire in candidates if fire in outcomes]
+        return min(scored, key=lambda fire: (np.mean(outcomes[fire]), fire != preferred))
+
+    def close(self):
+        self.executor.shutdown(cancel_futures=True)
+        self._unlink(self.base)
+        self._unlink(self.state)
+        self.base = self.state = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
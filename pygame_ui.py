@@ -14,38 +14,34 @@ INTERP_FRAMES = 5  # Frames between each model step
 BG_COLOR = (30, 30, 30)
 GRID_COLOR = (70, 70, 70)
 
-# Load fire animation frames
+# Images, loaded by load_images() from main so that importing this module stays cheap
+IMAGE_FILES = {
+    'tree': 'assets/forest.png',
+    'prison': 'assets/prison.png',
+    'policestation': 'assets/police_station.png',
+    'firestation': 'assets/fire_station.png',
+    'hospital': 'assets/hospital.png',
+    'arsonist': 'assets/thief.png',
+    'firefighter': 'assets/firefighter.png',
+    'firefighter_injured': 'assets/firefighter_injured.png',
+    'policeman': 'assets/policeman.png',
+    'citizen': 'assets/citizen.png',
+    'citizen_injured': 'assets/citizen_injured.png',
+    'ambulance': 'assets/ambulance.png',
+    'shelter': 'assets/shelter.png',
+}
+images = {}
 fire_frames = []
-for filename in sorted(glob.glob('assets/fire_frames/frame_*.png')):
-    img = pygame.image.load(filename)
-    img = pygame.transform.scale(img, (CELL_SIZE, CELL_SIZE))
-    fire_frames.append(img)
-
-# Images
-tree_image = pygame.image.load('assets/forest.png')
-tree_image = pygame.transform.scale(tree_image, (CELL_SIZE, CELL_SIZE))
-prison_image = pygame.image.load('assets/prison.png')
-prison_image = pygame.transform.scale(prison_image, (CELL_SIZE, CELL_SIZE))
-policestation_image = pygame.image.load('assets/police_station.png')
-policestation_image = pygame.transform.scale(policestation_image, (CELL_SIZE, CELL_SIZE))
-firestation_image = pygame.image.load('assets/fire_station.png')
-firestation_image = pygame.transform.scale(firestation_image, (CELL_SIZE, CELL_SIZE))
-hospital_image = pygame.image.load('assets/hospital.png')
-hospital_image = pygame.transform.scale(hospital_image, (CELL_SIZE, CELL_SIZE))
-arsonist_image = pygame.image.load('assets/thief.png')
-arsonist_image = pygame.transform.scale(arsonist_image, (CELL_SIZE, CELL_SIZE))
-firefighter_image = pygame.image.load('assets/firefighter.png')
-firefighter_image = pygame.transform.scale(firefighter_image, (CELL_SIZE, CELL_SIZE))
-firefighter_injured_image = pygame.image.load('assets/firefighter_injured.png')
-firefighter_injured_image = pygame.transform.scale(firefighter_injured_image, (CELL_SIZE, CELL_SIZE))
-policeman_image = pygame.image.load('assets/policeman.png')
-policeman_image = pygame.transform.scale(policeman_image, (CELL_SIZE, CELL_SIZE))
-citizen_image = pygame.image.load('assets/citizen.png')
-citizen_image = pygame.transform.scale(citizen_image, (CELL_SIZE, CELL_SIZE))
-citizen_injured_image = pygame.image.load('assets/citizen_injured.png')
-citizen_injured_image = pygame.transform.scale(citizen_injured_image, (CELL_SIZE, CELL_SIZE))
-ambulance_image = pygame.image.load('assets/ambulance.png')
-ambulance_image = pygame.transform.scale(ambulance_image, (CELL_SIZE, CELL_SIZE))
+
+def load_images():
+    # Fire animation frames
+    for filename in sorted(glob.glob('assets/fire_frames/frame_*.png')):
+        img = pygame.image.load(filename)
+        img = pygame.transform.scale(img, (CELL_SIZE, CELL_SIZE))
+        fire_frames.append(img)
+
+    for name, filename in IMAGE_FILES.items():
+        images[name] = pygame.transform.scale(pygame.image.load(filename), (CELL_SIZE, CELL_SIZE))
 
 def interpolate(a, b, t):
     return a + (b - a) * t
@@ -61,8 +57,9 @@ def draw_agents(screen, model, frame_index, tween_factor):
         for agent in contents:
             # Interpolated position
             x, y = agent.pos
-            if hasattr(agent, 'prev_pos') and agent.prev_pos is not None:
-                x_prev, y_prev = agent.prev_pos
+            prev_pos = model.previous_position(agent)
+            if prev_pos is not None:
+                x_prev, y_prev = prev_pos
                 x_draw = interpolate(x_prev, x, tween_factor)
                 y_draw = interpolate(y_prev, y, tween_factor)
             else:
@@ -74,39 +71,42 @@ def draw_agents(screen, model, frame_index, tween_factor):
 
             # Draw agents
             if agent.__class__.__name__ == 'TreeAgent':
-                screen.blit(tree_image, (screen_x, screen_y))
+                screen.blit(images['tree'], (screen_x, screen_y))
                 if agent.on_fire:
                     frame = fire_frames[frame_index]
                     screen.blit(frame, (screen_x, screen_y))
             elif agent.__class__.__name__ == 'PrisonAgent':
-                screen.blit(prison_image, (screen_x, screen_y))
+                screen.blit(images['prison'], (screen_x, screen_y))
             elif agent.__class__.__name__ == 'PolicestationAgent':
-                screen.blit(policestation_image, (screen_x, screen_y))
+                screen.blit(images['policestation'], (screen_x, screen_y))
             elif agent.__class__.__name__ == 'FirestationAgent':
-                screen.blit(firestation_image, (screen_x, screen_y))
+                screen.blit(images['firestation'], (screen_x, screen_y))
             elif agent.__class__.__name__ == 'HospitalAgent':
-                screen.blit(hospital_image, (screen_x, screen_y))
+                screen.blit(images['hospital'], (screen_x, screen_y))
+            elif agent.__class__.__name__ == 'ShelterAgent':
+                screen.blit(images['shelter'], (screen_x, screen_y))
             elif agent.__class__.__name__ == 'CitizenAgent':
                 if agent.injury_points > 0:
-                    screen.blit(citizen_injured_image, (screen_x, screen_y))
+                    screen.blit(images['citizen_injured'], (screen_x, screen_y))
                 else:
-                    screen.blit(citizen_image, (screen_x, screen_y))
+                    screen.blit(images['citizen'], (screen_x, screen_y))
             elif agent.__class__.__name__ == 'ArsonistAgent':
-                screen.blit(arsonist_image, (screen_x, screen_y))
+                screen.blit(images['arsonist'], (screen_x, screen_y))
             elif agent.__class__.__name__ == 'FirefighterAgent':
                 if agent.injury_points > 0:
-                    screen.blit(firefighter_injured_image, (screen_x, screen_y))
+                    screen.blit(images['firefighter_injured'], (screen_x, screen_y))
                 else:
-                    screen.blit(firefighter_image, (screen_x, screen_y))
+                    screen.blit(images['firefighter'], (screen_x, screen_y))
             elif agent.__class__.__name__ == 'PolicemanAgent':
-                screen.blit(policeman_image, (screen_x, screen_y))
+                screen.blit(images['policeman'], (screen_x, screen_y))
             elif agent.__class__.__name__ == 'AmbulanceAgent':
-                screen.blit(ambulance_image, (screen_x, screen_y))
+                screen.blit(images['ambulance'], (screen_x, screen_y))
 
 def main():
     pygame.init()
     screen = pygame.display.set_mode((WIDTH, HEIGHT))
     pygame.display.set_caption('Disaster Simulation - Pygame')
+    load_images()
     clock = pygame.time.Clock()
 
     model = DisasterModel(GRID_WIDTH, GRID_HEIGHT)
@@ -132,10 +132,8 @@ def main():
         if interp_frame >= INTERP_FRAMES:
             interp_frame = 0
 
-            # Set prev_pos before moving
-            for agent in model.agents:
-                if hasattr(agent, 'pos'):
-                    agent.prev_pos = agent.pos
+            # Positions before moving, to interpolate from
+            model.snapshot_positions()
 
             model.step()
 
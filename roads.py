@@ -0,0 +1,147 @@
+from collections import deque
+import networkx as nx
+import numpy as np
+
+class RoadNetwork:
+    """
+    Road layer of the grid for the responders. Nodes are grid positions, edges carry the time in steps
+    to drive them. Shortest-path trees rooted at the stations are computed once per map, trees rooted at
+    other targets (fires, patients) are computed on first use and kept in a bounded cache, so travel_time
+    and next_position are dict lookups once a tree exists. closest searches from wherever a responder is
+    without touching the cache.
+    """
+
+    def __init__(self, graph, width, height, max_cached_trees=256):
+        self.graph = graph
+        self.width = width
+        self.height = height
+        self.max_cached_trees = max_cached_trees
+        self.pinned = {} # Trees of the stations, never evicted
+        self.trees = {} # Other trees, least recently used first
+        self.snap_x, self.snap_y, self.snap_distance = self._nearest_nodes()
+
+    @classmethod
+    def grid(cls, width, height, spacing=5, road_speed=2, **kwargs):
+        """Streets every `spacing` cells plus along the borders, driven at `road_speed` cells per step"""
+        # next_position moves whole edges per step, travel_time would be too optimistic otherwise
+        if road_speed < 1 or road_speed != int(road_speed):
+            raise ValueError(f'road_speed must be a whole number of cells per step, got {road_speed}')
+        xs = sorted(set(range(0, width, spacing)) | {width - 1})
+        ys = sorted(set(range(0, height, spacing)) | {height - 1})
+        on_road = lambda node: node[0] in xs or node[1] in ys
+        graph = nx.grid_2d_graph(width, height)
+        graph = graph.subgraph([node for node in graph if on_road(node)]).copy()
+        nx.set_edge_attributes(graph, 1 / road_speed, 'time')
+        return cls(graph, width, height, **kwargs)
+
+    def _nearest_nodes(self):
+        # Multi-source BFS over the 8-neighbourhood: the closest node of every cell in moves of move_towards
+        snap_x = np.full((self.width, self.height), -1, dtype=np.int32)
+        snap_y = np.full((self.width, self.height), -1, dtype=np.int32)
+        distance = np.full((self.width, self.height), -1, dtype=np.int32)
+        queue = deque()
+        for x, y in self.graph:
+            snap_x[x, y], snap_y[x, y], distance[x, y] = x, y, 0
+            queue.append((x, y))
+        while queue:
+            x, y = queue.popleft()
+            for cx, cy in ((x + dx, y + dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)):
+                if 0 <= cx < self.width and 0 <= cy < self.height and distance[cx, cy] < 0:
+                    snap_x[cx, cy], snap_y[cx, cy] = snap_x[x, y], snap_y[x, y]
+                    distance[cx, cy] = distance[x, y] + 1
+                    queue.append((cx, cy))
+        return snap_x, snap_y, distance
+
+    def nearest_node(self, pos):
+        x, y = pos
+        return (int(self.snap_x[x, y]), int(self.snap_y[x, y]))
+
+    def precompute(self, positions):
+        """Build and pin the trees of fixed destinations, e.g. the stations of the map"""
+        for pos in positions:
+            root = self.nearest_node(pos)
+            if root not in self.pinned:
+                self.pinned[root] = self.trees.pop(root, None) or self._build_tree(root)
+
+    def _build_tree(self, root):
+        # The graph is undirected, so the predecessors towards the root are the next hops to it
+        pred, dist = nx.dijkstra_predecessor_and_distance(self.graph, root, weight='time')
+        return {node: (pred[node][0] if pred[node] else node, dist[node]) for node in dist}
+
+    def _tree(self, root):
+        tree = self.pinned.get(root)
+        if tree is not None:
+            return tree
+        tree = self.trees.pop(root, None)
+        if tree is None:
+            tree = self._build_tree(root)
+            if len(self.trees) >= self.max_cached_trees:
+                del self.trees[next(iter(self.trees))]
+        self.trees[root] = tree
+        return tree
+
+    def road_time(self, a, b):
+        """Steps from a to b driving from the node nearest to a to the node nearest to b, inf if not connected"""
+        source, target = self.nearest_node(a), self.nearest_node(b)
+        # Either end may have a pinned tree, query that one rather than building the other
+        if source in self.pinned and target not in self.pinned:
+            source, target = target, source
+        _, time = self._tree(target).get(source, (None, float('inf')))
+        return self.snap_distance[a] + time + self.snap_distance[b]
+
+    def travel_time(self, a, b):
+        """Steps from a to b, on foot across the cells or by road, whichever is faster"""
+        direct = max(abs(a[0] - b[0]), abs(a[1] - b[1]))
+        return min(direct, self.road_time(a, b))
+
+    def closest(self, origin, targets):
+        """The target with the shortest travel_time from origin, without building or caching a tree rooted at origin"""
+        direct = {target: max(abs(origin[0] - target[0]), abs(origin[1] - target[1])) for target in targets}
+        source = self.nearest_node(origin)
+        if source in self.pinned:
+            tree = self.pinned[source]
+            node_time = lambda node: tree.get(node, (None, float('inf')))[1]
+        else:
+            # Roads slower than walking to the closest target can't win, the search stops there
+            cutoff = min(direct.values()) - self.snap_distance[origin]
+            times = nx.single_source_dijkstra_path_length(self.graph, source, cutoff=cutoff, weight='time') if cutoff > 0 else {}
+            node_time = lambda node: times.get(node, float('inf'))
+        road = lambda target: self.snap_distance[origin] + node_time(self.nearest_node(target)) + self.snap_distance[target]
+        return min(direct, key=lambda target: min(direct[target], road(target)))
+
+    def times_from(self, pos):
+        """travel_time from pos to every cell as a (width, height) array"""
+        root = self.nearest_node(pos)
+        node_time = np.full((self.width, self.height), np.inf)
+        for node, (_, time) in self._tree(root).items():
+            node_time[node] = time
+        road = self.snap_distance[pos] + node_time[self.snap_x, self.snap_y] + self.snap_distance
+        xs, ys = np.indices((self.width, self.height))
+        return np.minimum(np.maximum(abs(xs - pos[0]), abs(ys - pos[1])), road)
+
+    def next_position(self, pos, target):
+        """Where an agent at pos gets in one step on its fastest way to target"""
+        if pos == target:
+            return pos
+        direct = max(abs(pos[0] - target[0]), abs(pos[1] - target[1]))
+        if direct <= self.road_time(pos, target):
+            return step_towards(pos, target)
+        source, destination = self.nearest_node(pos), self.nearest_node(target)
+        if pos != source:
+            return step_towards(pos, source) # Walk to the road first
+        # Hop along the tree for one step worth of road time
+        tree = self._tree(destination)
+        node, budget = pos, 1.0
+        while node != destination:
+            next_node = tree[node][0]
+            budget -= self.graph.edges[node, next_node]['time']
+            if budget < -1e-9:
+                break
+            node = next_node
+        return node
+
+def step_towards(pos, target):
+    # Same move as utils.move_towards
+    x, y = pos
+    tx, ty = target
+    return (x + (tx > x) - (tx < x), y + (ty > y) - (ty < y))
@@ -0,0 +1,85 @@
+import json
+import os
+import numpy as np
+
+OBS_SIZE = 100 # 10x10 partial observation of the arsonist
+
+TRANSITION = np.dtype([
+    ('agent', np.int32),
+    ('obs', np.uint8, (OBS_SIZE,)),
+    ('action', np.int8),
+    ('reward', np.float32),
+    ('done', np.bool_),
+])
+
+class RolloutRecorder:
+    """
+    Appends arsonist transitions to fixed-size memory-mapped .npy shards in `directory`,
+    so recording long runs never holds more than the pages being written in RAM.
+    """
+
+    def __init__(self, directory, shard_size=65536):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.shard_size = shard_size
+        self.shards = []
+        self.shard = None
+        self.count = 0
+        self.last = {} # agent id -> (shard, row) of its last transition, to mark it done later
+        self._open_shard()
+
+    def _open_shard(self):
+        name = f'shard_{len(self.shards):05d}.npy'
+        self.shard = np.lib.format.open_memmap(os.path.join(self.directory, name), mode='w+', dtype=TRANSITION, shape=(self.shard_size,))
+        self.shards.append({'file': name, 'count': 0})
+        self.count = 0
+
+    def _write_index(self):
+        with open(os.path.join(self.directory, 'index.json'), 'w') as f:
+            json.dump({'shards': self.shards}, f)
+
+    def record(self, agent_id, obs, action, reward, done=False):
+        if self.count == self.shard_size:
+            self.shard.flush()
+            self._write_index()
+            self._open_shard()
+
+        row = self.shard[self.count]
+        row['agent'] = agent_id
+        row['obs'] = obs
+        row['action'] = action
+        row['reward'] = reward
+        row['done'] = done
+        self.last[agent_id] = (self.shard, self.count)
+        self.count += 1
+        self.shards[-1]['count'] = self.count
+
+    def end_episode(self, agent_id, reward=0.0):
+        """Mark the last transition of an agent as terminal, adding the final reward to it"""
+        if agent_id not in self.last:
+            return
+        shard, row = self.last.pop(agent_id)
+        shard[row]['reward'] += reward
+        shard[row]['done'] = True
+
+    def close(self):
+        self.shard.flush()
+        self._write_index()
+        self.shard = None
+        self.last = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def iter_rollouts(directory, batch_size=4096):
+    """Stream the recorded transitions as structured array batches, shard by shard"""
+    with open(os.path.join(directory, 'index.json')) as f:
+        shards = json.load(f)['shards']
+
+    for shard in shards:
+        data = np.load(os.path.join(directory, shard['file']), mmap_mode='r')
+        for start in range(0, shard['count'], batch_size):
+            yield data[start:min(start + batch_size, shard['count'])]
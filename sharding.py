@@ -0,0 +1,250 @@
+import inspect
+import multiprocessing as mp
+from multiprocessing.shared_memory import SharedMemory
+import numpy as np
+from model import DisasterModel
+from agents import CitizenAgent, TreeAgent
+
+LEFT, RIGHT = 0, 1
+MAX_MIGRANTS = 256 # Per tile edge and step, extra citizens wait for the next step
+JOIN_TIMEOUT = 5 # Seconds a tile gets to stop on close before it is terminated
+
+# Counts that describe the whole map and are split between tiles, given or DisasterModel's defaults
+SPLIT_COUNTS = ('num_trees', 'num_prison', 'num_policestations', 'num_firestations', 'num_hospitals', 'num_shelters',
+                'num_citizens', 'num_arsonists', 'num_firefighters', 'num_policemen', 'num_ambulances')
+# Buildings a tile needs at least one of as soon as it has some of these agents, if the map has any
+WORKPLACES = {
+    'num_firefighters': ('num_firestations',),
+    'num_policemen': ('num_policestations', 'num_prison'),
+    'num_ambulances': ('num_hospitals',),
+}
+
+def split_count(total, num_tiles, index):
+    return total // num_tiles + (1 if index < total % num_tiles else 0)
+
+def tile_kwargs(model_kwargs, num_tiles, index):
+    # DisasterModel arguments of one tile
+    defaults = inspect.signature(DisasterModel).parameters
+    totals = {key: model_kwargs.get(key, defaults[key].default) for key in SPLIT_COUNTS}
+    kwargs = dict(model_kwargs, **{key: split_count(total, num_tiles, index) for key, total in totals.items()})
+    for key, buildings in WORKPLACES.items():
+        if kwargs[key] > 0:
+            for building in buildings:
+                kwargs[building] = max(kwargs[building], min(totals[building], 1))
+    return kwargs
+
+class HaloBuffers:
+    """Boundary state every tile publishes for its neighbours, backed by one shared memory block"""
+
+    def __init__(self, num_tiles, height, name=None):
+        self.num_tiles = num_tiles
+        self.height = height
+        shapes = self._layout(num_tiles, height)
+        size = sum(int(np.prod(shape)) * np.dtype(dtype).itemsize for shape, dtype in shapes.values())
+        if name is None:
+            self.shm = SharedMemory(create=True, size=size)
+        else:
+            self.shm = SharedMemory(name=name, track=False)
+
+        offset = 0
+        for key, (shape, dtype) in shapes.items():
+            array = np.ndarray(shape, dtype=dtype, buffer=self.shm.buf, offset=offset)
+            setattr(self, key, array)
+            offset += array.nbytes
+
+    @staticmethod
+    def _layout(num_tiles, height):
+        return {
+            'fire': ((num_tiles, 2, height), np.int8), # Burning trees on the outer columns
+            'migrants': ((num_tiles, 2, MAX_MIGRANTS, 2), np.int32), # (y, injury points) of leaving citizens
+            'migrant_counts': ((num_tiles, 2), np.int32),
+        }
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def close(self):
+        # Drop the views before closing, otherwise the buffer is still exported
+        del self.fire, self.migrants, self.migrant_counts
+        self.shm.close()
+
+def tile_worker(index, num_tiles, tile_width, height, offset_x, model_kwargs, halo_name, barrier, conn):
+    has_neighbour = {LEFT: index > 0, RIGHT: index < num_tiles - 1}
+    edge_x = {LEFT: 0, RIGHT: tile_width - 1}
+
+    halo = None
+    try:
+        # Built inside the try, a tile failing to start must release the others too
+        halo = HaloBuffers(num_tiles, height, name=halo_name)
+        model = DisasterModel(tile_width, height, **model_kwargs)
+        while conn.recv() == 'step':
+            previous = {agent: agent.pos for agent in model.agents_by_type.get(CitizenAgent, ())}
+            model.step()
+
+            # Publish outgoing citizens and the fire state of the outer columns
+            migrated = 0
+            for side in (LEFT, RIGHT):
+                halo.fire[index, side] = 0
+                for y in range(height):
+                    for agent in model.grid.get_cell_list_contents((edge_x[side], y)):
+                        if isinstance(agent, TreeAgent) and agent.on_fire:
+                            halo.fire[index, side, y] = 1
+
+                # Citizens walking onto the edge column keep walking into the neighbour tile
+                leaving = []
+                if has_neighbour[side]:
+                    leaving = [agent for agent, pos in previous.items() if agent.pos is not None and not agent.in_care and agent.pos[0] == edge_x[side] != pos[0]]
+                count = min(len(leaving), MAX_MIGRANTS)
+                for slot, agent in enumerate(leaving[:count]):
+                    halo.migrants[index, side, slot] = (agent.pos[1], agent.injury_points)
+                    model.remove_citizen(agent)
+                halo.migrant_counts[index, side] = count
+                migrated += count
+            barrier.wait()
+
+            # Read what the neighbours published, tile i's right edge faces tile i+1's left edge
+            halo_fires = []
+            for side in (LEFT, RIGHT):
+                if not has_neighbour[side]:
+                    continue
+                neighbour = index - 1 if side == LEFT else index + 1
+                facing = RIGHT if side == LEFT else LEFT
+                for y, injury_points in halo.migrants[neighbour, facing, :halo.migrant_counts[neighbour, facing]]:
+                    agent = CitizenAgent(model)
+                    agent.injury_points = int(injury_points)
+                    agent.injured_at = model.steps if agent.injury_points > 0 else None
+                    model.add_citizen(agent, (edge_x[side], int(y)))
+
+                # Citizens on the edge see fires right across the border
+                fire = halo.fire[neighbour, facing]
+                neighbour_x = offset_x - 1 if side == LEFT else offset_x + tile_width
+                for y in range(height):
+                    if not fire[max(y - 1, 0):y + 2].any():
+                        continue
+                    for agent in model.grid.get_cell_list_contents((edge_x[side], y)):
+                        if isinstance(agent, CitizenAgent):
+                            halo_fires.extend((neighbour_x, fy) for fy in range(max(y - 1, 0), min(y + 2, height)) if fire[fy])
+                            break
+            barrier.wait()
+
+            commander = model.commander
+            conn.send({
+                'fires': {(x + offset_x, y) for x, y in commander.known_fires} | set(halo_fires),
+                'injured': {(x + offset_x, y) for x, y in commander.known_injured},
+                'arsonists': {(x + offset_x, y) for x, y in commander.known_arsonist_positions},
+                'migrated': migrated,
+            })
+    except BaseException:
+        # Release the other tiles waiting on this one
+        barrier.abort()
+        raise
+    finally:
+        if halo is not None:
+            halo.close()
+        conn.close()
+
+class ShardedSimulation:
+    """
+    One large map split into vertical strips, each simulated by its own DisasterModel in its own process.
+    Every step the tiles exchange the citizens crossing their borders and the fire state of their outer
+    columns through shared memory, and the commanders' reports are merged into global coordinates.
+
+    The agent and building counts are split between the tiles, a tile with responders gets at least one
+    station for them. Only citizens cross tile borders: arsonists and responders stay in the tile they
+    start in and only answer the reports of its commander, moving them across tiles is out of scope.
+    """
+
+    def __init__(self, width, height, num_tiles=None, **model_kwargs):
+        if num_tiles is None:
+            num_tiles = mp.cpu_count()
+        num_tiles = min(num_tiles, width // 3) # A tile needs an inner column between its edges
+        if num_tiles < 1:
+            raise ValueError(f'Grid of width {width} is too narrow to be split into tiles')
+
+        self.width = width
+        self.height = height
+        self.num_tiles = num_tiles
+        self.steps = 0
+        self.known_fires = set()
+        self.known_injured = set()
+        self.known_arsonist_positions = set()
+        self.migrations = 0
+
+        self.halo = HaloBuffers(num_tiles, height)
+        self.halo.migrant_counts[:] = 0
+        self.barrier = mp.Barrier(num_tiles)
+        self.connections = []
+        self.processes = []
+        self.tiles = [] # (offset_x, width) of every tile
+
+        # Independent seeds for the tiles, all derived from the seed of the simulation
+        tile_seeds = np.random.SeedSequence(model_kwargs.get('seed')).spawn(num_tiles)
+
+        offset_x = 0
+        for index in range(num_tiles):
+            tile_width = split_count(width, num_tiles, index)
+            kwargs = dict(tile_kwargs(model_kwargs, num_tiles, index), seed=tile_seeds[index])
+
+            parent_conn, child_conn = mp.Pipe()
+            process = mp.Process(
+                target=tile_worker,
+                args=(index, num_tiles, tile_width, height, offset_x, kwargs, self.halo.name, self.barrier, child_conn),
+                daemon=True,
+            )
+            process.start()
+            child_conn.close()
+            self.connections.append(parent_conn)
+            self.processes.append(process)
+            self.tiles.append((offset_x, tile_width))
+            offset_x += tile_width
+
+    def step(self):
+        try:
+            for conn in self.connections:
+                conn.send('step')
+            reports = [conn.recv() for conn in self.connections]
+        except (EOFError, BrokenPipeError) as e:
+            # A tile died, the others cannot step without it
+            self.terminate()
+            raise RuntimeError('A tile process died, the sharded simulation was stopped') from e
+
+        self.known_fires = set().union(*(report['fires'] for report in reports))
+        self.known_injured = set().union(*(report['injured'] for report in reports))
+        self.known_arsonist_positions = set().union(*(report['arsonists'] for report in reports))
+        self.migrations += sum(report['migrated'] for report in reports)
+        self.steps += 1
+
+    def close(self):
+        for conn in self.connections:
+            try:
+                conn.send('stop')
+            except (BrokenPipeError, OSError):
+                pass
+            conn.close()
+        for process in self.processes:
+            process.join(timeout=JOIN_TIMEOUT)
+        self.terminate()
+        if self.halo is not None:
+            self.halo.close()
+            self.halo.shm.unlink()
+            self.halo = None
+
+    def terminate(self):
+        # Stop the tiles still running, e.g. those waiting on a tile that died
+        for process in self.processes:
+            if process.is_alive():
+                process.terminate()
+            process.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+if __name__ == '__main__':
+    with ShardedSimulation(80, 20, num_tiles=4, num_trees=80, num_citizens=40) as simulation:
+        for _ in range(50):
+            simulation.step()
+        print(f'Steps: {simulation.steps}, fires: {len(simulation.known_fires)}, migrations: {simulation.migrations}')
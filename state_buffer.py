@@ -0,0 +1,89 @@
+import time
+from multiprocessing.shared_memory import SharedMemory
+import numpy as np
+
+# Layers published every step: occupancy codes (see agents.OCCUPANCY_CODES), burning trees and injured agents
+LAYERS = {
+    'occupancy': np.int8,
+    'fire': np.uint8,
+    'injured': np.uint8,
+}
+
+class StateBuffer:
+    """
+    State layers of a DisasterModel in a shared memory block, readable from other processes without copies.
+
+    The header holds a sequence counter that is odd while a frame is being written (a seqlock),
+    followed by the step of the frame and the grid size, so readers only need the block name.
+    """
+
+    HEADER = 4 # sequence, step, width, height
+
+    def __init__(self, width=None, height=None, name=None):
+        if name is None:
+            size = (self.HEADER * 8) + width * height * sum(np.dtype(dtype).itemsize for dtype in LAYERS.values())
+            self.shm = SharedMemory(create=True, size=size)
+            self.owner = True
+        else:
+            self.shm = SharedMemory(name=name, track=False)
+            self.owner = False
+
+        self.header = np.ndarray((self.HEADER,), dtype=np.int64, buffer=self.shm.buf)
+        if self.owner:
+            self.header[:] = (0, 0, width, height)
+        self.width, self.height = int(self.header[2]), int(self.header[3])
+
+        self.layers = {}
+        offset = self.header.nbytes
+        for key, dtype in LAYERS.items():
+            layer = np.ndarray((self.width, self.height), dtype=dtype, buffer=self.shm.buf, offset=offset)
+            self.layers[key] = layer
+            offset += layer.nbytes
+        # The writer fills private layers, so the frame is only odd for the copy into shared memory
+        self.staging = {key: np.zeros_like(layer) for key, layer in self.layers.items()} if self.owner else None
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @property
+    def sequence(self):
+        return int(self.header[0])
+
+    def publish(self, model):
+        model.fill_state_layers(**self.staging)
+        self.header[0] += 1 # Odd: frame being written
+        for key, layer in self.layers.items():
+            np.copyto(layer, self.staging[key])
+        self.header[1] = model.steps
+        self.header[0] += 1
+
+    def read(self, copy=True, retries=100, backoff=1e-5, max_backoff=1e-3):
+        """
+        Return (sequence, step, layers) of the latest complete frame, or None if the writer kept it busy.
+        Between retries the reader sleeps, from `backoff` seconds doubling up to `max_backoff`.
+        With copy=False the layers are views into shared memory, call `changed_since(sequence)`
+        after using them to know whether the writer overwrote them meanwhile.
+        """
+        for _ in range(retries):
+            sequence = self.sequence
+            if sequence % 2 == 0:
+                step = int(self.header[1])
+                layers = {key: layer.copy() if copy else layer for key, layer in self.layers.items()}
+                if not self.changed_since(sequence):
+                    return sequence, step, layers
+            time.sleep(backoff)
+            backoff = min(backoff * 2, max_backoff)
+        return None
+
+    def changed_since(self, sequence):
+        return self.sequence != sequence
+
+    def close(self):
+        # Drop the views before closing, otherwise the buffer is still exported
+        self.header = None
+        self.layers = {}
+        self.staging = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
@@ -3,11 +3,19 @@ def manhattan_distance(a, b):
 
 def move_randomly(self):
     possible_steps = self.model.grid.get_neighborhood(self.pos, moore=True, include_center=False)
-    self.model.grid.move_agent(self, self.random.choice(possible_steps))
+    self.model.grid.move_agent(self, self.model.rngs['movement'].choice(possible_steps))
 
 def move_towards(self, target_pos):
     x, y = self.pos
     tx, ty = target_pos
     dx = 1 if tx > x else -1 if tx < x else 0
     dy = 1 if ty > y else -1 if ty < y else 0
-    self.model.grid.move_agent(self, (x + dx, y + dy))
\ No newline at end of file
+    self.model.grid.move_agent(self, (x + dx, y + dy))
+
+def travel(self, target_pos):
+    # Responders drive on the road network of the model when it has one
+    roads = self.model.roads
+    if roads is None:
+        move_towards(self, target_pos)
+    else:
+        self.model.grid.move_agent(self, roads.next_position(self.pos, target_pos))